@@ -0,0 +1,72 @@
+"""Сравнение двух прогонов benchmarks.run.
+
+    python -m benchmarks.compare base.json new.json --threshold 10
+
+Код возврата 1, если p95 какого-либо эндпоинта вырос больше чем на
+threshold процентов или увеличилось число запросов к БД.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "queries_mean")
+
+
+def change(base: float, new: float) -> float | None:
+    if not base:
+        return None
+    return (new - base) / base * 100
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[str]:
+    """Print a per-endpoint table, return the regressions found"""
+    print(f"{'endpoint':<40}" + "".join(f"{m:>22}" for m in METRICS))
+    regressions = []
+    for name, new_stats in new["endpoints"].items():
+        base_stats = base["endpoints"].get(name)
+        if base_stats is None:
+            print(f"{name:<40}  (нет в базовом прогоне)")
+            continue
+        cells = []
+        for metric in METRICS:
+            delta = change(base_stats[metric], new_stats[metric])
+            delta_text = "" if delta is None else f" ({delta:+.0f}%)"
+            cells.append(f"{new_stats[metric]:>13.2f}{delta_text:>9}")
+        print(f"{name:<40}" + "".join(cells))
+
+        p95_delta = change(base_stats["p95_ms"], new_stats["p95_ms"])
+        if p95_delta is not None and p95_delta > threshold:
+            regressions.append(f"{name}: p95 {p95_delta:+.1f}%")
+        if new_stats["queries_mean"] > base_stats["queries_mean"]:
+            regressions.append(
+                f"{name}: queries {base_stats['queries_mean']}"
+                f" -> {new_stats['queries_mean']}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение результатов бенчмарка")
+    parser.add_argument("base", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=10, help="% роста p95")
+    args = parser.parse_args()
+
+    base = json.loads(args.base.read_text())
+    new = json.loads(args.new.read_text())
+    for label, report in (("base", base), ("new", new)):
+        meta = report["meta"]
+        print(
+            f"{label}: {meta['created_at']} rev {meta['git_revision']}, "
+            f"{meta['database']}, {meta['cars']} cars"
+        )
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print("\nРегрессии:\n" + "\n".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Нагрузочный сценарий: виртуальные пользователи повторяют путь фронтенда.
+
+    python -m benchmarks.load --vus 100 --duration 60
+    ENV_FILE=.env python -m benchmarks.load --database-url postgresql+asyncpg://... \\
+        --skip-seed --run-id <run_id из src.db.demo_data>
+
+Каждый виртуальный пользователь входит через /auth/login, затем по кругу:
+список my_cars, карточка машины, расходы, добавление расходов, правка
+машины, добавление и удаление совладельца. Отчёт - задержки по шагам,
+доля ошибок и занятость пула соединений. По умолчанию база - временный
+файл SQLite, заполняемый генератором демо-данных.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# benchmarks.run points ENV_FILE at .env.test before src is imported
+from benchmarks.run import RESULTS_DIR, git_revision, percentile, seed
+from src.auth.utils import gen_pwd_hash
+from src.db.core import create_engine_from_config, get_session
+from src.db.demo_data import DEMO_PASSWORD, GeneratorOptions, user_uid
+from src.main import app
+
+API = "/api/v1"
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+    journeys: int = 0
+
+
+class StepFailed(Exception):
+    pass
+
+
+class VirtualUser:
+    def __init__(
+        self,
+        client: AsyncClient,
+        stats: Stats,
+        options: GeneratorOptions,
+        index: int,
+        think_time: float,
+    ):
+        self.client = client
+        self.stats = stats
+        self.options = options
+        self.index = index % options.users
+        self.think_time = think_time
+        self.rng = random.Random(index)
+        self.headers = {}
+        self.uid = None
+
+    async def step(self, name: str, method: str, url: str, expected=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, url, headers=self.headers, **kwargs
+            )
+        except Exception as e:  # pool timeouts and the like surface here
+            self.stats.latencies[name].append(time.perf_counter() - started)
+            self.stats.errors[name][type(e).__name__] += 1
+            raise StepFailed(name) from e
+        self.stats.latencies[name].append(time.perf_counter() - started)
+        if response.status_code not in expected:
+            self.stats.errors[name][str(response.status_code)] += 1
+            raise StepFailed(name)
+        if self.think_time:
+            await asyncio.sleep(self.rng.uniform(0, self.think_time))
+        return response.json() if response.content else None
+
+    async def login(self):
+        result = await self.step(
+            "login",
+            "POST",
+            f"{API}/auth/login",
+            data={
+                "username": f"demo_{self.options.run_id}_{self.index}@example.com",
+                "password": DEMO_PASSWORD,
+            },
+        )
+        self.headers = {"Authorization": f"Bearer {result['access_token']}"}
+        self.uid = result["user"]["user_uid"]
+
+    async def journey(self):
+        my_cars = await self.step(
+            "my_cars", "GET", f"{API}/cars/my_cars?limit=20&pagination=cursor"
+        )
+        own = [
+            car
+            for car in my_cars["result"]["content"]
+            if car["primary_owner_uid"] == self.uid
+        ]
+        if not own:
+            return
+        car_uid = self.rng.choice(own)["uid"]
+
+        car = await self.step("open_car", "GET", f"{API}/cars/{car_uid}")
+        await self.step(
+            "car_expenses", "GET", f"{API}/cars/{car_uid}/expenses?limit=20"
+        )
+        for _ in range(self.rng.randint(1, 3)):
+            await self.step(
+                "add_expense",
+                "POST",
+                f"{API}/cars/{car_uid}",
+                expected=(201,),
+                json={
+                    "type": self.rng.choice(["PARTS", "REPAIR", "FUEL", "OTHER"]),
+                    "name": "Нагрузочный тест",
+                    "exp_summ": self.rng.randint(1, 300) * 100,
+                },
+            )
+
+        update = {"notes": f"Обновлено {datetime.now():%H:%M:%S}"}
+        if car["result"]["status"] != "SOLD":
+            update["price_listed"] = self.rng.randint(300, 5000) * 1000
+        await self.step("edit_car", "PATCH", f"{API}/cars/{car_uid}", json=update)
+
+        owners = {self.uid} | {o["uid"] for o in car["result"]["secondary_owners"]}
+        new_owner = str(user_uid(self.options, self.rng.randrange(self.options.users)))
+        if new_owner not in owners:
+            await self.step(
+                "add_owner",
+                "POST",
+                f"{API}/cars/{car_uid}/owners",
+                params={"new_owner_uid": new_owner},
+            )
+            await self.step(
+                "remove_owner",
+                "DELETE",
+                f"{API}/cars/{car_uid}/owners/{new_owner}",
+                expected=(204,),
+                params={"delete_owner_uid": new_owner},
+            )
+
+    async def run(self, deadline: float):
+        try:
+            await self.login()
+        except StepFailed:
+            return
+        while time.perf_counter() < deadline:
+            try:
+                await self.journey()
+                self.stats.journeys += 1
+            except StepFailed:
+                pass
+
+
+async def sample_pool(engine, samples: list, interval: float = 0.05):
+    """Checked out connections over time; StaticPool and friends have no counters"""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return
+    while True:
+        samples.append((pool.checkedout(), pool.size(), pool.overflow()))
+        await asyncio.sleep(interval)
+
+
+def pool_report(engine, samples: list) -> dict:
+    pool = engine.pool
+    if not samples:
+        return {"class": type(pool).__name__}
+    capacity = pool.size() + getattr(pool, "_max_overflow", 0)
+    checked_out = [sample[0] for sample in samples]
+    return {
+        "class": type(pool).__name__,
+        "size": pool.size(),
+        "max_overflow": getattr(pool, "_max_overflow", None),
+        "checked_out_mean": round(sum(checked_out) / len(checked_out), 2),
+        "checked_out_max": max(checked_out),
+        "saturated_share": round(
+            sum(1 for c in checked_out if c >= capacity) / len(checked_out), 3
+        ),
+    }
+
+
+def summarize(stats: Stats, elapsed: float) -> dict:
+    steps = {}
+    for name, latencies in stats.latencies.items():
+        ms = [latency * 1000 for latency in latencies]
+        errors = sum(stats.errors[name].values())
+        steps[name] = {
+            "requests": len(ms),
+            "errors": errors,
+            "error_rate": round(errors / len(ms), 4),
+            "error_kinds": dict(stats.errors[name]),
+            "p50_ms": round(percentile(ms, 50), 3),
+            "p95_ms": round(percentile(ms, 95), 3),
+            "p99_ms": round(percentile(ms, 99), 3),
+            "max_ms": round(max(ms), 3),
+            "throughput_rps": round(len(ms) / elapsed, 1),
+        }
+    return steps
+
+
+def print_report(report: dict):
+    header = (
+        f"{'step':<16}{'requests':>10}{'errors':>8}{'err %':>8}"
+        f"{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, s in report["steps"].items():
+        print(
+            f"{name:<16}{s['requests']:>10}{s['errors']:>8}"
+            f"{s['error_rate'] * 100:>8.2f}{s['p50_ms']:>9.2f}"
+            f"{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['throughput_rps']:>9.1f}"
+        )
+    print(f"journeys: {report['journeys']}, pool: {report['pool']}")
+
+
+async def main(args: argparse.Namespace):
+    options = GeneratorOptions(
+        users=args.users,
+        cars=args.cars,
+        max_secondary_owners=2,
+        expenses_per_car=args.expenses_per_car,
+        run_id=args.run_id,
+        seed=args.seed,
+    )
+    database_url = args.database_url
+    if database_url is None:
+        path = Path(tempfile.gettempdir()) / "mywhip_load.db"
+        path.unlink(missing_ok=True)
+        database_url = f"sqlite+aiosqlite:///{path}"
+    # Same pool settings as the application itself
+    engine = create_engine_from_config(database_url)
+    session_factory = async_sessionmaker(
+        bind=engine, class_=AsyncSession, expire_on_commit=False
+    )
+    if not args.skip_seed:
+        started = time.perf_counter()
+        await seed(engine, options, pwd_hash=gen_pwd_hash(DEMO_PASSWORD))
+        print(f"Данные сгенерированы за {time.perf_counter() - started:.1f} сек")
+
+    async def override_get_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    stats = Stats()
+    samples = []
+    sampler = asyncio.create_task(sample_pool(engine, samples))
+    started = time.perf_counter()
+    deadline = started + args.ramp_up + args.duration
+    try:
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+
+            async def start(index: int):
+                await asyncio.sleep(args.ramp_up * index / args.vus)
+                vu = VirtualUser(client, stats, options, index, args.think_time)
+                await vu.run(deadline)
+
+            await asyncio.gather(*(start(i) for i in range(args.vus)))
+    finally:
+        sampler.cancel()
+        app.dependency_overrides.pop(get_session, None)
+    elapsed = time.perf_counter() - started
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "database": engine.dialect.name,
+            "vus": args.vus,
+            "duration": args.duration,
+            "ramp_up": args.ramp_up,
+            "think_time": args.think_time,
+            "elapsed_seconds": round(elapsed, 2),
+        },
+        "journeys": stats.journeys,
+        "pool": pool_report(engine, samples),
+        "steps": summarize(stats, elapsed),
+    }
+    await engine.dispose()
+    print_report(report)
+    output = args.output or RESULTS_DIR / (
+        f"load-{datetime.now():%Y%m%d-%H%M%S}-{report['meta']['git_revision']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Результаты: {output}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный сценарий")
+    parser.add_argument("--vus", type=int, default=50, help="Виртуальных пользователей")
+    parser.add_argument("--duration", type=float, default=30, help="Секунд")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Секунд")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Макс. пауза")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--cars", type=int, default=2000)
+    parser.add_argument("--expenses-per-car", type=float, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--run-id", default="bench", help="Префикс демо-пользователей")
+    parser.add_argument("--skip-seed", action="store_true", help="Данные уже есть")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--output", type=Path, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
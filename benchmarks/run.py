@@ -0,0 +1,369 @@
+"""Бенчмарк эндпоинтов: задержки p50/p95/p99, пропускная способность и
+число SQL-запросов на запрос.
+
+    python -m benchmarks.run --users 200 --cars 5000 --requests 300
+    python -m benchmarks.compare benchmarks/results/a.json benchmarks/results/b.json
+
+Приложение вызывается в том же процессе через ASGITransport, как в
+tests/conftest.py; по умолчанию база - SQLite в памяти.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+os.environ.setdefault("ENV_FILE", str(Path(__file__).parent.parent / ".env.test"))
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.utils import create_access_token
+from src.cars.models import Cars, Expenses
+from src.cars.schemas import ExpenseType
+from src.db.core import get_session
+from src.db.demo_data import (
+    CAR_COLUMNS,
+    EXPENSE_COLUMNS,
+    LINK_COLUMNS,
+    USER_COLUMNS,
+    GeneratorOptions,
+    generate_cars,
+    generate_users,
+    load_directory_weights,
+)
+from src.directories.utils import load_directory
+from src.main import app
+from src.shared.car_user_link import CarUserLink
+from src.users.models import Users
+from src.users.schemas import UserRole
+
+RESULTS_DIR = Path(__file__).parent / "results"
+API = "/api/v1"
+
+
+@dataclass
+class Target:
+    """Car picked for a request together with its primary owner's token"""
+
+    car_uid: str
+    expense_uid: str
+    token: str
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    path: Callable[[Target], str]
+    body: Callable[[Target], dict] | None = None
+    admin: bool = False
+
+
+ENDPOINTS = [
+    Endpoint("GET /cars/{uid}", "GET", lambda t: f"{API}/cars/{t.car_uid}"),
+    Endpoint("GET /cars/my_cars", "GET", lambda t: f"{API}/cars/my_cars?limit=20"),
+    Endpoint(
+        "POST /cars/all",
+        "POST",
+        lambda t: f"{API}/cars/all",
+        lambda t: {"status": "SOLD", "limit": 20, "sort_by": "profit"},
+        admin=True,
+    ),
+    Endpoint(
+        "GET /cars/{uid}/expenses",
+        "GET",
+        lambda t: f"{API}/cars/{t.car_uid}/expenses?limit=20",
+    ),
+    Endpoint(
+        "GET /cars/{uid}/expenses/{exp_uid}",
+        "GET",
+        lambda t: f"{API}/cars/{t.car_uid}/expenses/{t.expense_uid}",
+    ),
+    Endpoint(
+        "POST /cars/{uid} (expense)",
+        "POST",
+        lambda t: f"{API}/cars/{t.car_uid}",
+        lambda t: {"type": "OTHER", "name": "Бенчмарк", "exp_summ": 1000},
+    ),
+    Endpoint(
+        "PATCH /cars/{uid}/expenses/{exp_uid}",
+        "PATCH",
+        lambda t: f"{API}/cars/{t.car_uid}/expenses/{t.expense_uid}",
+        lambda t: {"type": "PURCHASE", "name": "Покупка", "exp_summ": 500000},
+    ),
+]
+
+
+@dataclass
+class QueryCounter:
+    count: int = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+@dataclass
+class EndpointResult:
+    latencies: list[float] = field(default_factory=list)
+    queries: list[int] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(result: EndpointResult) -> dict:
+    ms = [latency * 1000 for latency in result.latencies]
+    return {
+        "requests": len(ms),
+        "errors": result.errors,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+        "max_ms": round(max(ms), 3),
+        "throughput_rps": round(len(ms) / result.elapsed, 1),
+        "queries_mean": round(sum(result.queries) / len(result.queries), 2),
+        "queries_max": max(result.queries),
+    }
+
+
+async def seed(
+    engine, options: GeneratorOptions, pwd_hash: str = "", chunk_size: int = 5000
+):
+    """Directory, users, cars, links and expenses from the demo generator"""
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await load_directory(conn)
+        directory = await load_directory_weights(conn)
+    tables = (
+        (Users, USER_COLUMNS),
+        (Cars, CAR_COLUMNS),
+        (CarUserLink, LINK_COLUMNS),
+        (Expenses, EXPENSE_COLUMNS),
+    )
+    user_rows = generate_users(options, 0, options.users, pwd_hash)
+    async with engine.begin() as conn:
+        await conn.execute(
+            Users.__table__.insert(), [dict(zip(USER_COLUMNS, r)) for r in user_rows]
+        )
+    for start in range(0, options.cars, chunk_size):
+        stop = min(start + chunk_size, options.cars)
+        chunk = generate_cars(options, start, stop, *directory)
+        async with engine.begin() as conn:
+            for (model, columns), rows in zip(tables[1:], chunk):
+                if rows:
+                    await conn.execute(
+                        model.__table__.insert(),
+                        [dict(zip(columns, row)) for row in rows],
+                    )
+
+
+async def pick_targets(session_factory, count: int, rng: random.Random):
+    async with session_factory() as session:
+        result = await session.exec(
+            # The purchase expense is authored by the primary owner,
+            # so the owner's token may also update it
+            select(Cars.uid, Cars.primary_owner_uid, Expenses.uid)
+            .join(Expenses, Expenses.car_uid == Cars.uid)
+            .where(Expenses.type == ExpenseType.PURCHASE)
+        )
+        rows = list(result.all())
+    by_car = {car_uid: (owner_uid, exp_uid) for car_uid, owner_uid, exp_uid in rows}
+    cars = rng.sample(sorted(by_car), min(count, len(by_car)))
+    return [
+        Target(
+            car_uid=str(car_uid),
+            expense_uid=str(by_car[car_uid][1]),
+            token=create_access_token(str(by_car[car_uid][0])),
+        )
+        for car_uid in cars
+    ]
+
+
+async def make_admin(session_factory) -> str:
+    """Promote one of the generated users, /cars/all is admin-only"""
+    async with session_factory() as session:
+        result = await session.exec(select(Users.uid).order_by(Users.uid).limit(1))
+        user_uid = result.scalar_one()
+        await session.exec(
+            update(Users).where(Users.uid == user_uid).values(role=UserRole.ADMIN)
+        )
+        await session.commit()
+    return create_access_token(str(user_uid))
+
+
+async def run_endpoint(
+    client: AsyncClient,
+    endpoint: Endpoint,
+    targets: list[Target],
+    admin_token: str,
+    counter: QueryCounter,
+    requests: int,
+    warmup: int,
+) -> EndpointResult:
+    result = EndpointResult()
+    started = time.perf_counter()
+    for i in range(warmup + requests):
+        target = targets[i % len(targets)]
+        token = admin_token if endpoint.admin else target.token
+        kwargs = {"headers": {"Authorization": f"Bearer {token}"}}
+        if endpoint.body is not None:
+            kwargs["json"] = endpoint.body(target)
+        if i == warmup:
+            started = time.perf_counter()
+        queries_before = counter.count
+        request_started = time.perf_counter()
+        response = await client.request(
+            endpoint.method, endpoint.path(target), **kwargs
+        )
+        latency = time.perf_counter() - request_started
+        if i < warmup:
+            continue
+        result.latencies.append(latency)
+        result.queries.append(counter.count - queries_before)
+        if response.status_code >= 400:
+            result.errors += 1
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict):
+    header = (
+        f"{'endpoint':<40}{'p50':>9}{'p95':>9}{'p99':>9}"
+        f"{'rps':>9}{'queries':>9}{'errors':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, stats in report["endpoints"].items():
+        print(
+            f"{name:<40}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+            f"{stats['p99_ms']:>9.2f}{stats['throughput_rps']:>9.1f}"
+            f"{stats['queries_mean']:>9.1f}{stats['errors']:>8}"
+        )
+
+
+async def main(args: argparse.Namespace):
+    options = GeneratorOptions(
+        users=args.users,
+        cars=args.cars,
+        max_secondary_owners=2,
+        expenses_per_car=args.expenses_per_car,
+        run_id="bench",
+        seed=args.seed,
+    )
+    engine = create_async_engine(args.database_url, echo=False)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    seed_started = time.perf_counter()
+    # The password is never checked: tokens are issued directly
+    await seed(engine, options)
+    seed_time = time.perf_counter() - seed_started
+    print(f"Данные сгенерированы за {seed_time:.1f} сек")
+
+    rng = random.Random(args.seed)
+    targets = await pick_targets(session_factory, args.targets, rng)
+    admin_token = await make_admin(session_factory)
+
+    async def override_get_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    counter = QueryCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+
+    selected = [e for e in ENDPOINTS if not args.only or e.name in args.only]
+    endpoints = {}
+    try:
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            for endpoint in selected:
+                result = await run_endpoint(
+                    client,
+                    endpoint,
+                    targets,
+                    admin_token,
+                    counter,
+                    args.requests,
+                    args.warmup,
+                )
+                endpoints[endpoint.name] = summarize(result)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", counter)
+        app.dependency_overrides.pop(get_session, None)
+        await engine.dispose()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "users": args.users,
+            "cars": args.cars,
+            "expenses_per_car": args.expenses_per_car,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "seed_seconds": round(seed_time, 2),
+        },
+        "endpoints": endpoints,
+    }
+    print_report(report)
+    output = args.output or RESULTS_DIR / (
+        f"{datetime.now():%Y%m%d-%H%M%S}-{report['meta']['git_revision']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Результаты: {output}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк эндпоинтов")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--cars", type=int, default=2000)
+    parser.add_argument("--expenses-per-car", type=float, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="На эндпоинт")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--targets", type=int, default=100, help="Разных машин")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", help="Имена эндпоинтов")
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///:memory:")
+    parser.add_argument("--output", type=Path, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,35 @@
+"""car_user_link_cascade_del
+
+Revision ID: 452647008993
+Revises: 62052892d307
+Create Date: 2026-10-18 11:02:14.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '452647008993'
+down_revision: Union[str, None] = '62052892d307'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_constraint('car_user_link_car_uid_fkey', 'car_user_link', type_='foreignkey')
+    op.drop_constraint('car_user_link_user_uid_fkey', 'car_user_link', type_='foreignkey')
+    op.create_foreign_key('car_user_link_car_uid_fkey', 'car_user_link', 'cars', ['car_uid'], ['uid'], ondelete='CASCADE')
+    op.create_foreign_key('car_user_link_user_uid_fkey', 'car_user_link', 'users', ['user_uid'], ['uid'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('car_user_link_user_uid_fkey', 'car_user_link', type_='foreignkey')
+    op.drop_constraint('car_user_link_car_uid_fkey', 'car_user_link', type_='foreignkey')
+    op.create_foreign_key('car_user_link_user_uid_fkey', 'car_user_link', 'users', ['user_uid'], ['uid'])
+    op.create_foreign_key('car_user_link_car_uid_fkey', 'car_user_link', 'cars', ['car_uid'], ['uid'])
@@ -0,0 +1,81 @@
+"""cars_financial_aggregates
+
+Revision ID: 62052892d307
+Revises: 99377c061444
+Create Date: 2026-10-18 10:12:31.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '62052892d307'
+down_revision: Union[str, None] = '99377c061444'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cars', sa.Column('purchase_total', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('cars', sa.Column('expenses_total', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('cars', sa.Column('total_cost', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('cars', sa.Column('profit', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('cars', sa.Column('margin', sa.Float(), server_default='0', nullable=False))
+    op.add_column('cars', sa.Column('potential_profit', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('cars', sa.Column('potential_margin', sa.Float(), server_default='0', nullable=False))
+
+    # Backfill from existing expenses
+    op.execute(
+        """
+        UPDATE cars SET
+            purchase_total = totals.purchase_total,
+            expenses_total = totals.expenses_total
+        FROM (
+            SELECT
+                car_uid,
+                COALESCE(SUM(exp_summ) FILTER (WHERE type = 'PURCHASE'), 0) AS purchase_total,
+                COALESCE(SUM(exp_summ) FILTER (WHERE type <> 'PURCHASE'), 0) AS expenses_total
+            FROM expenses
+            GROUP BY car_uid
+        ) AS totals
+        WHERE cars.uid = totals.car_uid
+        """
+    )
+    op.execute("UPDATE cars SET total_cost = purchase_total + expenses_total")
+    op.execute(
+        """
+        UPDATE cars SET
+            profit = CASE WHEN price_sold IS NULL THEN 0 ELSE price_sold - total_cost END,
+            potential_profit = CASE WHEN price_listed IS NULL THEN 0 ELSE price_listed - total_cost END
+        """
+    )
+    op.execute(
+        """
+        UPDATE cars SET
+            margin = CASE WHEN total_cost = 0 THEN 0 ELSE round(profit * 100::numeric / total_cost, 2) END,
+            potential_margin = CASE WHEN total_cost = 0 THEN 0 ELSE round(potential_profit * 100::numeric / total_cost, 2) END
+        """
+    )
+
+    op.create_index(op.f('ix_cars_total_cost'), 'cars', ['total_cost'], unique=False)
+    op.create_index(op.f('ix_cars_profit'), 'cars', ['profit'], unique=False)
+    op.create_index(op.f('ix_cars_margin'), 'cars', ['margin'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_cars_margin'), table_name='cars')
+    op.drop_index(op.f('ix_cars_profit'), table_name='cars')
+    op.drop_index(op.f('ix_cars_total_cost'), table_name='cars')
+    op.drop_column('cars', 'potential_margin')
+    op.drop_column('cars', 'potential_profit')
+    op.drop_column('cars', 'margin')
+    op.drop_column('cars', 'profit')
+    op.drop_column('cars', 'total_cost')
+    op.drop_column('cars', 'expenses_total')
+    op.drop_column('cars', 'purchase_total')
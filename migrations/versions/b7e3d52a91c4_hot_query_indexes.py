@@ -0,0 +1,45 @@
+"""hot_query_indexes
+
+Revision ID: b7e3d52a91c4
+Revises: 452647008993
+Create Date: 2026-10-18 11:40:05.733190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3d52a91c4'
+down_revision: Union[str, None] = '452647008993'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# CREATE/DROP INDEX CONCURRENTLY does not lock writes but cannot run inside a
+# transaction, hence the autocommit blocks
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_cars_vin_status', 'cars', ['vin', 'status'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_cars_status_created_at', 'cars', ['status', 'created_at'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_cars_make_model_created_at', 'cars', ['make', 'model', 'created_at'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_expenses_car_uid_created_at', 'expenses', ['car_uid', 'created_at'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_car_user_link_car_uid', 'car_user_link', ['car_uid', 'user_uid'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_makesdir_lower_make', 'makesdir', [sa.text('lower(make)')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_modelsdir_make_uid_lower_model', 'modelsdir', ['make_uid', sa.text('lower(model)')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_modelsdir_make_uid_lower_model', table_name='modelsdir', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_makesdir_lower_make', table_name='makesdir', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_car_user_link_car_uid', table_name='car_user_link', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_expenses_car_uid_created_at', table_name='expenses', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_cars_make_model_created_at', table_name='cars', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_cars_status_created_at', table_name='cars', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_cars_vin_status', table_name='cars', postgresql_concurrently=True, if_exists=True)
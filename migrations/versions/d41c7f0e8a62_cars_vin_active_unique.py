@@ -0,0 +1,35 @@
+"""cars_vin_active_unique
+
+Revision ID: d41c7f0e8a62
+Revises: b7e3d52a91c4
+Create Date: 2026-10-18 12:21:47.095512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41c7f0e8a62'
+down_revision: Union[str, None] = 'b7e3d52a91c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Fails if two not sold cars already share a VIN: resolve those rows first.
+# The unique index also serves the VIN lookups, (vin, status) is redundant
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('uq_cars_vin_active', 'cars', ['vin'], unique=True, postgresql_where=sa.text("status <> 'SOLD'"), postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_cars_vin_status', table_name='cars', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_cars_vin_status', 'cars', ['vin', 'status'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('uq_cars_vin_active', table_name='cars', postgresql_concurrently=True, if_exists=True)
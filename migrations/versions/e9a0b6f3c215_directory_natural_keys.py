@@ -0,0 +1,35 @@
+"""directory_natural_keys
+
+Revision ID: e9a0b6f3c215
+Revises: d41c7f0e8a62
+Create Date: 2026-10-18 13:05:52.640117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9a0b6f3c215'
+down_revision: Union[str, None] = 'd41c7f0e8a62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Fails on duplicate makes or (make_uid, model) pairs left by re-running the
+# old loader without clearing the tables: remove the duplicates first
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('uq_makesdir_make', 'makesdir', ['make'], unique=True, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('uq_modelsdir_make_uid_model', 'modelsdir', ['make_uid', 'model'], unique=True, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('uq_modelsdir_make_uid_model', table_name='modelsdir', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('uq_makesdir_make', table_name='makesdir', postgresql_concurrently=True, if_exists=True)
@@ -8,6 +8,7 @@ from src.users.schemas import UserSchema, UserRole
 from src.users.service import UserService
 from fastapi.security import OAuth2PasswordBearer
 from src.auth.utils import decode_token
+from src.utils.timing import timed
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
@@ -22,7 +23,8 @@ async def get_current_user(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Token invalid or expired"
         )
-    user = await user_service.get_by_uid(table=Users, uid=token_data["sub"])
+    with timed("user_lookup"):
+        user = await user_service.get_by_uid(table=Users, uid=token_data["sub"])
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
@@ -9,11 +9,12 @@ from src.users.schemas import UserSchema
 from src.auth.schemas import AuthSchema
 from src.auth.dependencies import get_auth_service, get_current_user
 from src.users.service import UserService
+from src.utils.timing import TimedRoute
 from fastapi.security import HTTPBearer
 
 security = HTTPBearer()
 
-auth_router = APIRouter()
+auth_router = APIRouter(route_class=TimedRoute)
 
 
 @auth_router.post("/login")
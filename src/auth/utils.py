@@ -4,6 +4,7 @@ import uuid
 import logging
 import bcrypt
 from src.config import Config
+from src.utils.timing import timed
 
 ACCESS_TOKEN_EXPIRY = 3600
 
@@ -37,9 +38,10 @@ def create_access_token(user_uid: str, expiry: timedelta = None):
 def decode_token(token: str) -> dict:
 
     try:
-        token_data = jwt.decode(
-            jwt=token, key=Config.JWT_SECRET, algorithms=[Config.JWT_ALGORITHM]
-        )
+        with timed("jwt"):
+            token_data = jwt.decode(
+                jwt=token, key=Config.JWT_SECRET, algorithms=[Config.JWT_ALGORITHM]
+            )
         return token_data
     except jwt.PyJWTError as e:
         logging.error(f"JWT decoding failed: {e}")
@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import ENUM
 from sqlmodel import Field, Column, Relationship, SQLModel
 import sqlalchemy.dialects.postgresql as pg
@@ -14,13 +14,26 @@ if TYPE_CHECKING:
     from ..users.models import Users
 
 from ..config import IS_TEST_ENV
-from src.utils.db_types import UUIDString
+from src.utils.db_types import UUIDString, SQLiteTimestamp
 
 UUIDColumn = UUIDString if IS_TEST_ENV else pg.UUID
+TimestampColumn = SQLiteTimestamp if IS_TEST_ENV else pg.TIMESTAMP
 
 
 class Cars(SQLModel, table=True):
     __tablename__ = "cars"
+    __table_args__ = (
+        # One active (not sold) car per VIN
+        Index(
+            "uq_cars_vin_active",
+            "vin",
+            unique=True,
+            postgresql_where=text("status <> 'SOLD'"),
+            sqlite_where=text("status <> 'SOLD'"),
+        ),
+        Index("ix_cars_status_created_at", "status", "created_at"),
+        Index("ix_cars_make_model_created_at", "make", "model", "created_at"),
+    )
     uid: UUID = Field(
         sa_column=Column(UUIDColumn, nullable=False, primary_key=True, default=uuid4)
     )
@@ -44,11 +57,23 @@ class Cars(SQLModel, table=True):
     avito_link: str = Field(default=None, nullable=True)
     autoru_link: str = Field(default=None, nullable=True)
     drom_link: str = Field(default=None, nullable=True)
+    # Financial aggregates, maintained by the expenses/cars repositories
+    purchase_total: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    expenses_total: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    total_cost: int = Field(
+        default=0, index=True, sa_column_kwargs={"server_default": "0"}
+    )
+    profit: int = Field(default=0, index=True, sa_column_kwargs={"server_default": "0"})
+    margin: float = Field(
+        default=0, index=True, sa_column_kwargs={"server_default": "0"}
+    )
+    potential_profit: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    potential_margin: float = Field(default=0, sa_column_kwargs={"server_default": "0"})
     created_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP, default=now(), nullable=False)
+        sa_column=Column(TimestampColumn, default=now(), nullable=False)
     )
     updated_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP, default=now(), onupdate=now(), nullable=True)
+        sa_column=Column(TimestampColumn, default=now(), onupdate=now(), nullable=True)
     )
     primary_owner_uid: UUID = Field(
         sa_column=Column(
@@ -60,19 +85,19 @@ class Cars(SQLModel, table=True):
     )
     primary_owner: Optional["Users"] = Relationship(
         sa_relationship_kwargs={
-            "lazy": "selectin",
             "primaryjoin": "Cars.primary_owner_uid==Users.uid",
         }
     )
+    # Children are removed by ON DELETE CASCADE, not loaded and deleted one by one
     secondary_owners: list["Users"] = Relationship(
         back_populates="cars",
         link_model=CarUserLink,
-        sa_relationship_kwargs={"lazy": "selectin"},
+        passive_deletes=True,
     )
     expenses: list["Expenses"] = Relationship(
         back_populates="car",
-        sa_relationship_kwargs={"lazy": "selectin"},
         cascade_delete=True,
+        passive_deletes=True,
     )
 
     def __repr__(self):
@@ -81,6 +106,7 @@ class Cars(SQLModel, table=True):
 
 class Expenses(SQLModel, table=True):
     __tablename__ = "expenses"
+    __table_args__ = (Index("ix_expenses_car_uid_created_at", "car_uid", "created_at"),)
     uid: UUID = Field(
         sa_column=Column(UUIDColumn, nullable=False, primary_key=True, default=uuid4)
     )
@@ -90,7 +116,7 @@ class Expenses(SQLModel, table=True):
     name: str
     exp_summ: int
     created_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP, default=now(), nullable=False)
+        sa_column=Column(TimestampColumn, default=now(), nullable=False)
     )
     car_uid: UUID = Field(
         sa_column=Column(
@@ -1,22 +1,156 @@
+from decimal import Decimal
 from typing import Optional
 from uuid import UUID
 
-from fastapi import HTTPException
-from sqlalchemy import func, desc, asc, and_, or_
+from sqlalchemy import (
+    Numeric,
+    and_,
+    case,
+    exists,
+    func,
+    insert,
+    literal,
+    or_,
+    text,
+)
+from sqlalchemy import select as sa_select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
-from sqlmodel import select, update
+from sqlmodel import SQLModel, delete, select, update
 from src.cars.models import Cars, Expenses
-from src.cars.schemas import GetAllFilter
+from src.cars.schemas import ExpenseType, GetAllFilter
 from src.shared.car_user_link import CarUserLink
+from src.users.models import Users
 from src.utils.base_service_repo import BaseRepository
+from src.utils.exceptions import VinBusyException
+
+ACTIVE_VIN_INDEX = "uq_cars_vin_active"
+
+# numeric literal keeps round() valid on PostgreSQL and the division non-integer
+_HUNDRED = literal(Decimal(100), Numeric)
+
+
+def _sql(value):
+    return literal(value) if isinstance(value, int) else value
+
+
+def car_totals_values(
+    purchase_total=Cars.purchase_total,
+    expenses_total=Cars.expenses_total,
+    price_listed=Cars.price_listed,
+    price_sold=Cars.price_sold,
+) -> dict:
+    """SET clause for the cars financial aggregates.
+    Arguments are the new purchase/expenses totals and prices, either values
+    or SQL expressions over the current row, so one UPDATE keeps them in sync"""
+    total_cost = _sql(purchase_total) + _sql(expenses_total)
+
+    def profit_for(price):
+        if price is None:
+            return literal(0)
+        if isinstance(price, int):
+            return price - total_cost
+        return case((price.is_(None), 0), else_=price - total_cost)
+
+    def margin_for(profit):
+        return case(
+            (total_cost == 0, 0),
+            else_=func.round(profit * _HUNDRED / total_cost, 2),
+        )
+
+    profit = profit_for(price_sold)
+    potential_profit = profit_for(price_listed)
+    return {
+        "purchase_total": purchase_total,
+        "expenses_total": expenses_total,
+        "total_cost": total_cost,
+        "profit": profit,
+        "margin": margin_for(profit),
+        "potential_profit": potential_profit,
+        "potential_margin": margin_for(potential_profit),
+    }
+
+
+def violates_active_vin(error: IntegrityError) -> bool:
+    """Is the error the active VIN unique index and not some other constraint"""
+    orig = error.orig
+    # asyncpg: the server error is the cause; psycopg: orig.diag
+    for source in (orig.__cause__, getattr(orig, "diag", None)):
+        constraint_name = getattr(source, "constraint_name", None)
+        if constraint_name:
+            return constraint_name == ACTIVE_VIN_INDEX
+    # SQLite names the indexed columns instead of the index
+    return "UNIQUE constraint failed: cars.vin" in str(orig)
+
+
+def expense_deltas(exp_type: str, exp_summ: int) -> tuple[int, int]:
+    if exp_type == ExpenseType.PURCHASE:
+        return exp_summ, 0
+    return 0, exp_summ
+
+
+def car_totals_update(car_uid: UUID, purchase_delta: int = 0, expenses_delta: int = 0):
+    """Apply an expense change to the car aggregates, updated_at stays as is"""
+    return (
+        update(Cars)
+        .where(Cars.uid == car_uid)
+        .values(
+            updated_at=Cars.updated_at,
+            **car_totals_values(
+                purchase_total=Cars.purchase_total + purchase_delta,
+                expenses_total=Cars.expenses_total + expenses_delta,
+            ),
+        )
+    )
 
 
 class CarsRepository(BaseRepository):
 
-    async def check_vin_collision(self, vin: str) -> Cars:
-        statement = select(Cars).where(Cars.vin == vin, Cars.status != "SOLD")
+    async def update_by_uid(
+        self, table: SQLModel, uid: UUID, update_dict: dict, options: list = None
+    ) -> Optional[Cars]:
+        # Prices take part in profit/margin, recalculate them in the same UPDATE
+        if table is Cars and update_dict.keys() & {"price_listed", "price_sold"}:
+            update_dict = {
+                **update_dict,
+                **car_totals_values(
+                    price_listed=update_dict.get("price_listed", Cars.price_listed),
+                    price_sold=update_dict.get("price_sold", Cars.price_sold),
+                ),
+            }
+        try:
+            return await super().update_by_uid(table, uid, update_dict, options)
+        except IntegrityError as e:
+            await self.session.rollback()
+            if violates_active_vin(e):
+                # vin or status change ran into another active car with the same VIN
+                raise VinBusyException
+            raise
+
+    async def create_car(self, new_car_dict: dict) -> Optional[Cars]:
+        """Single INSERT ... ON CONFLICT DO NOTHING against the active VIN index.
+        None means the VIN is held by a car that is not sold yet"""
+        connection = await self.session.connection()
+        if connection.dialect.name == "postgresql":
+            dialect_insert = pg_insert
+        else:
+            dialect_insert = sqlite_insert
+        statement = (
+            dialect_insert(Cars)
+            .values(**new_car_dict)
+            .on_conflict_do_nothing(
+                # literal predicate, PostgreSQL can't match a bound one to the index
+                index_elements=[Cars.vin],
+                index_where=text("status <> 'SOLD'"),
+            )
+            .returning(Cars)
+        )
         result = await self.session.exec(statement)
-        return result.one_or_none()
+        car = result.scalars().one_or_none()
+        await self.session.commit()
+        return car
 
     async def add_owner_to_car(self, car_uid: UUID, user_uid: UUID):
         link = CarUserLink(car_uid=car_uid, user_uid=user_uid)
@@ -37,6 +171,36 @@ class CarsRepository(BaseRepository):
         else:
             return False
 
+    async def check_car_membership(
+        self, car_uid: UUID, user_uid: UUID
+    ) -> Optional[bool]:
+        """Is the user an owner of the car: None if there is no such car"""
+        is_secondary = exists().where(
+            CarUserLink.car_uid == Cars.uid, CarUserLink.user_uid == user_uid
+        )
+        statement = select(or_(Cars.primary_owner_uid == user_uid, is_secondary)).where(
+            Cars.uid == car_uid
+        )
+        result = await self.session.exec(statement)
+        return result.one_or_none()
+
+    async def get_expenses_by_owner(
+        self, car_uids: list[UUID]
+    ) -> dict[UUID, dict[UUID, int]]:
+        """Expenses summed per car and user in one grouped query.
+        Expenses of users that no longer exist are not counted"""
+        statement = (
+            select(Expenses.car_uid, Expenses.user_uid, func.sum(Expenses.exp_summ))
+            .join(Users, Users.uid == Expenses.user_uid)
+            .where(Expenses.car_uid.in_(car_uids))
+            .group_by(Expenses.car_uid, Expenses.user_uid)
+        )
+        result = await self.session.exec(statement)
+        expenses_by_owner = {car_uid: {} for car_uid in car_uids}
+        for car_uid, user_uid, exp_summ in result.all():
+            expenses_by_owner[car_uid][user_uid] = exp_summ
+        return expenses_by_owner
+
     async def get_my_cars(
         self,
         offset_page: int,
@@ -44,41 +208,36 @@ class CarsRepository(BaseRepository):
         owner_uid: UUID,
         sort_by: Optional[str] = None,
         order: str = "desc",
-    ):
+        keyset: bool = False,
+        cursor: Optional[str] = None,
+        total: str = "exact",
+    ) -> tuple[list[Cars], Optional[int]]:
+        # EXISTS, not a join: a car with co-owners must come back once
+        is_secondary = exists().where(
+            CarUserLink.car_uid == Cars.uid, CarUserLink.user_uid == owner_uid
+        )
         statement = (
-            select(Cars)
-            .outerjoin(CarUserLink, Cars.uid == CarUserLink.car_uid)
-            .where(
-                or_(
-                    Cars.primary_owner_uid == owner_uid,
-                    CarUserLink.user_uid == owner_uid,
-                )
-            )
-            .offset(offset_page)
-            .limit(limit)
-        )
-        if sort_by:
-            sort_column = getattr(Cars, sort_by, None)
-            if sort_column is None:
-                raise HTTPException(
-                    status_code=422, detail=f"Invalid sort field: {sort_by}"
-                )
-            if order == "desc":
-                statement = statement.order_by(desc(sort_column))
-            else:
-                statement = statement.order_by(asc(sort_column))
-
-        return await self.session.exec(statement)
-
-    async def count_my_cars(self, owner_uid: UUID):
-        result = await self.session.exec(
-            select(func.count(Cars.uid)).where(Cars.primary_owner_uid == owner_uid)
+            sa_select(Cars)
+            .options(selectinload(Cars.secondary_owners))
+            .where(or_(Cars.primary_owner_uid == owner_uid, is_secondary))
+        )
+        return await self.paginate(
+            statement,
+            Cars,
+            offset_page,
+            limit,
+            sort_by,
+            order,
+            keyset=keyset,
+            cursor=cursor,
+            total=total,
         )
-        return result.one()
 
-    async def get_cars_filtered(self, offset_page, filter_schema: GetAllFilter):
+    async def get_cars_filtered(
+        self, offset_page, filter_schema: GetAllFilter, keyset: bool = False
+    ) -> tuple[list[Cars], Optional[int]]:
         # Base query
-        statement = select(Cars)
+        statement = sa_select(Cars).options(selectinload(Cars.secondary_owners))
         # Filtering
         if filter_schema.make:
             statement = statement.filter_by(make=filter_schema.make)
@@ -95,47 +254,43 @@ class CarsRepository(BaseRepository):
                 )
         if filter_schema.status:
             statement = statement.filter_by(status=filter_schema.status)
-        # Sorting
-        direction = desc if (filter_schema.order_desc == "desc") else asc
-        if filter_schema.sort_by:
-            statement = statement.order_by(
-                direction(getattr(Cars, filter_schema.sort_by))
-            )
-
-        statement = statement.offset(offset_page).limit(filter_schema.limit)
-        cars = await self.session.exec(statement)
-        return cars
-
-    async def count_filtered_records(self, filter_schema: GetAllFilter) -> int:
-        statement = select(func.count(Cars.uid))
-        if filter_schema.make:
-            statement = statement.filter_by(make=filter_schema.make)
-        if filter_schema.model:
-            statement = statement.filter_by(model=filter_schema.model)
-        if filter_schema.prod_year:
-            if filter_schema.prod_year.year_from:
-                statement = statement.filter(
-                    Cars.year >= filter_schema.prod_year.year_from
-                )
-            if filter_schema.prod_year.year_to:
-                statement = statement.filter(
-                    Cars.year <= filter_schema.prod_year.year_to
-                )
-        if filter_schema.status:
-            statement = statement.filter_by(status=filter_schema.status)
-
-        result = await self.session.exec(statement)
-        return result.one()
+        for field in ("total_cost", "profit", "margin"):
+            value_range = getattr(filter_schema, field)
+            if value_range is None:
+                continue
+            column = getattr(Cars, field)
+            if value_range.value_from is not None:
+                statement = statement.filter(column >= value_range.value_from)
+            if value_range.value_to is not None:
+                statement = statement.filter(column <= value_range.value_to)
+        # Sorting and pagination
+        return await self.paginate(
+            statement,
+            Cars,
+            offset_page,
+            filter_schema.limit,
+            filter_schema.sort_by,
+            filter_schema.order_desc,
+            keyset=keyset,
+            cursor=filter_schema.cursor,
+            total=filter_schema.total,
+        )
 
 
 class ExpensesRepository(BaseRepository):
     async def create_expense(self, car_uid: UUID, exp_data_dict: dict) -> Expenses:
 
-        new_exp = Expenses(**exp_data_dict)
-        new_exp.car_uid = car_uid
-        self.session.add(new_exp)
+        result = await self.session.exec(
+            insert(Expenses)
+            .values(**exp_data_dict, car_uid=car_uid)
+            .returning(Expenses)
+            .options(selectinload(Expenses.user))
+        )
+        new_exp = result.scalars().one()
+        await self.session.exec(
+            car_totals_update(car_uid, *expense_deltas(new_exp.type, new_exp.exp_summ))
+        )
         await self.session.commit()
-        await self.session.refresh(new_exp, attribute_names=["user"])
         return new_exp
 
     async def get_single_exp(self, car_uid: UUID, expense_uid: str) -> Expenses:
@@ -155,64 +310,86 @@ class ExpensesRepository(BaseRepository):
         limit: int,
         sort_by: Optional[str] = None,
         order: str = "desc",
-    ) -> list[Expenses]:
+        keyset: bool = False,
+        cursor: Optional[str] = None,
+        total: str = "exact",
+    ) -> tuple[list[Expenses], Optional[int]]:
         statement = (
-            select(Expenses)
+            sa_select(Expenses)
             .options(selectinload(Expenses.user))
             .where(Expenses.car_uid == car_uid)
-            .offset(offset_page)
-            .limit(limit)
-        )
-        if sort_by:
-            sort_column = getattr(Expenses, sort_by, None)
-            if sort_column is None:
-                raise HTTPException(
-                    status_code=422, detail=f"Invalid sort field: {sort_by}"
-                )
-            if order == "desc":
-                statement = statement.order_by(desc(sort_column))
-            else:
-                statement = statement.order_by(asc(sort_column))
-        return await self.session.exec(statement)
-
-    async def count_exp_by_car_uid(self, car_uid: UUID) -> int:
-        count_statement = (
-            select(func.count(1))
-            .select_from(Expenses)
-            .where(Expenses.car_uid == car_uid)
         )
-        result = await self.session.exec(count_statement)
-        return result.one()
+        return await self.paginate(
+            statement,
+            Expenses,
+            offset_page,
+            limit,
+            sort_by,
+            order,
+            keyset=keyset,
+            cursor=cursor,
+            total=total,
+        )
 
     async def update_single_exp(
         self, car_uid: UUID, expense_uid: UUID, update_data_dict: dict
-    ) -> Expenses:
-        exp = await self.get_single_exp(car_uid, expense_uid)
-        await self.session.exec(
-            update(Expenses)
+    ) -> Optional[Expenses]:
+        """Old values for the aggregates delta are read under a row lock, so a
+        concurrent update or delete of the same expense can't skew the car totals.
+        None if the expense is gone"""
+        result = await self.session.exec(
+            select(Expenses.type, Expenses.exp_summ)
             .where(Expenses.car_uid == car_uid)
             .where(Expenses.uid == expense_uid)
+            .with_for_update()
+        )
+        old = result.one_or_none()
+        if old is None:
+            return None
+        old_purchase, old_expenses = expense_deltas(*old)
+        result = await self.session.exec(
+            update(Expenses)
+            .where(Expenses.uid == expense_uid)
             .values(**update_data_dict)
+            .returning(Expenses)
+            .options(selectinload(Expenses.user))
+            .execution_options(populate_existing=True)
+        )
+        exp = result.scalars().one()
+        new_purchase, new_expenses = expense_deltas(exp.type, exp.exp_summ)
+        await self.session.exec(
+            car_totals_update(
+                exp.car_uid, new_purchase - old_purchase, new_expenses - old_expenses
+            )
         )
         await self.session.commit()
-        await self.session.refresh(exp)
         return exp
 
     async def delete_single_exp(self, car_uid: UUID, expense_uid: UUID) -> bool:
-        exp_to_delete = await self.get_single_exp(car_uid, expense_uid)
-        if exp_to_delete:
-            await self.session.delete(exp_to_delete)
+        result = await self.session.exec(
+            delete(Expenses)
+            .where(Expenses.car_uid == car_uid)
+            .where(Expenses.uid == expense_uid)
+            .returning(Expenses.type, Expenses.exp_summ)
+        )
+        deleted = result.one_or_none()
+        if deleted:
+            purchase, expenses = expense_deltas(*deleted)
+            await self.session.exec(car_totals_update(car_uid, -purchase, -expenses))
             await self.session.commit()
             return True
         else:
             return False
 
     async def delete_exp_by_car_uid(self, car_uid: UUID) -> bool:
-        result = await self.session.exec(
-            select(Expenses).where(Expenses.car_uid == car_uid)
+        await self.session.exec(delete(Expenses).where(Expenses.car_uid == car_uid))
+        await self.session.exec(
+            update(Cars)
+            .where(Cars.uid == car_uid)
+            .values(
+                updated_at=Cars.updated_at,
+                **car_totals_values(purchase_total=0, expenses_total=0),
+            )
         )
-        exps = result.all()
-        for exp in exps:
-            await self.session.delete(exp)
         await self.session.commit()
         return True
@@ -7,6 +7,7 @@ from src.cars.models import Cars
 from src.cars.service import CarService, ExpensesService
 from src.users.schemas import UserSchema
 from src.utils.schemas_common import ResponseSchema, PageResponse
+from src.utils.timing import TimedRoute
 from src.cars.schemas import (
     CarUpdateSchema,
     CarCreateSchema,
@@ -20,8 +21,8 @@ from src.cars.schemas import (
     CarListSchema,
 )
 
-car_router = APIRouter()
-expenses_router = APIRouter()
+car_router = APIRouter(route_class=TimedRoute)
+expenses_router = APIRouter(route_class=TimedRoute)
 
 
 # Create a Car
@@ -53,6 +54,15 @@ async def get_my_cars(
     order: str = Query(
         default="desc", pattern="^(asc|desc)$", description="Порядок сортировки"
     ),
+    pagination: str = Query(
+        default="offset", pattern="^(offset|cursor)$", description="Режим пагинации"
+    ),
+    cursor: str | None = Query(default=None, description="next_cursor"),
+    total: str = Query(
+        default="exact",
+        pattern="^(exact|estimate|none)$",
+        description="Подсчёт общего количества",
+    ),
     car_service: CarService = Depends(get_car_service),
     current_user: UserSchema = Depends(get_current_user),
 ) -> dict:
@@ -61,6 +71,9 @@ async def get_my_cars(
         limit=limit,
         sort_by=sort_by,
         order=order,
+        keyset=pagination == "cursor",
+        cursor=cursor,
+        total=total,
         allowed_sort_fields=[
             "created_at",
             "updated_at",
@@ -242,6 +255,15 @@ async def get_expenses_by_car_uid(
     order: str = Query(
         default="desc", pattern="^(asc|desc)$", description="Порядок сортировки"
     ),
+    pagination: str = Query(
+        default="offset", pattern="^(offset|cursor)$", description="Режим пагинации"
+    ),
+    cursor: str | None = Query(default=None, description="next_cursor"),
+    total: str = Query(
+        default="exact",
+        pattern="^(exact|estimate|none)$",
+        description="Подсчёт общего количества",
+    ),
     expenses_service: ExpensesService = Depends(get_exp_service),
     current_user: UserSchema = Depends(get_current_user),
 ):
@@ -251,6 +273,9 @@ async def get_expenses_by_car_uid(
         limit=limit,
         sort_by=sort_by,
         order=order,
+        keyset=pagination == "cursor",
+        cursor=cursor,
+        total=total,
         allowed_sort_fields=["created_at", "exp_summ", "name"],
         current_user=current_user,
     )
@@ -116,8 +116,11 @@ class CarSchema(BaseModel):
     created_at: datetime | None = None
     updated_at: datetime | None = created_at
     status: CarStatusChoices | None = Field(default=CarStatusChoices.FRESH)
+    total_cost: int | None = None
+    profit: int | None = None
+    margin: float | None = None
     stats: CarStats | None = None
-    expenses: List["ExpensesSchema"] | None = None
+    # Expenses are served paginated by /cars/{car_uid}/expenses
 
 
 class CarListSchema(BaseModel):
@@ -186,6 +189,11 @@ class ProdYear(BaseModel):
     year_to: int | None = Field(ge=1970, le=int(datetime.now().year))
 
 
+class ValueRange(BaseModel):
+    value_from: float | None = None
+    value_to: float | None = None
+
+
 class GetAllFilter(BaseModel):
     page: int = Field(default=1, ge=1)
     limit: int = Field(default=10, ge=1)
@@ -193,13 +201,19 @@ class GetAllFilter(BaseModel):
     model: str | None = None
     prod_year: ProdYear | None = None
     status: CarStatusChoices | None = None
+    total_cost: ValueRange | None = None
+    profit: ValueRange | None = None
+    margin: ValueRange | None = None
     sort_by: Literal[
         "created_at",
         "updated_at",
         "year",
         "make",
         "model",
-        "price_purchased",
+        "purchase_total",
+        "total_cost",
+        "profit",
+        "margin",
         "price_listed",
         "price_sold",
         "date_purchased",
@@ -207,3 +221,6 @@ class GetAllFilter(BaseModel):
         "date_sold",
     ] = "created_at"
     order_desc: Literal["desc", "asc"] = "desc"
+    pagination: Literal["offset", "cursor"] = "offset"
+    cursor: str | None = None
+    total: Literal["exact", "estimate", "none"] = "exact"
@@ -1,12 +1,10 @@
-import math
-from collections import defaultdict
 from typing import Optional
 from uuid import UUID
 
 from fastapi import HTTPException, status
 from sqlalchemy.orm import selectinload
 
-from src.utils.schemas_common import PageResponse
+from src.utils.pagination import split_keyset_page
 from .models import Cars, Expenses
 from .repositories import CarsRepository, ExpensesRepository
 from .schemas import (
@@ -27,45 +25,22 @@ from src.directories.service import DirectoryService
 from ..users.schemas import UserSchema, UserRole
 from ..utils.base_service_repo import BaseService
 from ..utils.normalize_make_model import normalize_make_model
+from ..utils.timing import timed
 
 
 def calculate_car_metrics(car: CarSchema) -> dict:
-    total_expenses = sum(
-        (exp.exp_summ for exp in car.expenses if exp.type != "PURCHASE") or []
-    )
-    price_purchased = sum(
-        (exp.exp_summ for exp in car.expenses if exp.type == "PURCHASE") or []
-    )
-    total_cost = total_expenses + price_purchased
-    potential_profit = (car.price_listed - total_cost) if car.price_listed else 0
-    potential_margin = (
-        round(potential_profit / total_cost * 100, 2) if total_cost else 0
-    )
-
-    profit = (car.price_sold - total_cost) if car.price_sold else 0
-    margin = round(profit / total_cost * 100, 2) if total_cost else 0
-
+    # Aggregates are persisted on the car and kept up to date on every write
     return {
-        "price_purchased": price_purchased,
-        "total_expenses": total_expenses,
-        "total_cost": total_cost,
-        "profit": profit,
-        "margin": margin,
-        "potential_profit": potential_profit,
-        "potential_margin": potential_margin,
+        "price_purchased": car.purchase_total,
+        "total_expenses": car.expenses_total,
+        "total_cost": car.total_cost,
+        "profit": car.profit,
+        "margin": car.margin,
+        "potential_profit": car.potential_profit,
+        "potential_margin": car.potential_margin,
     }
 
 
-def get_expenses_by_owner(car: CarSchema) -> dict[UUID, int]:
-    expenses_by_user = defaultdict(int)
-
-    for exp in car.expenses or []:
-        if exp.user and exp.user.uid:
-            expenses_by_user[exp.user.uid] += exp.exp_summ
-
-    return expenses_by_user
-
-
 def build_owners_stats(
     car: CarSchema, expenses_by_user: dict[UUID, int], profit: int
 ) -> list[OwnerStats]:
@@ -73,30 +48,21 @@ def build_owners_stats(
     owners_count = len(owners)
     profit_per_owner = profit / owners_count if owners_count else 0
 
-    # Сопоставляем UID → UserShortSchema из расходов
+    # Сопоставляем UID → UserShortSchema владельцев
+    po = getattr(car, "primary_owner", None)
     users_map = {
-        exp.user.uid: exp.user
-        for exp in car.expenses or []
-        if exp.user and exp.user.uid
-    }
-
-    # Добавим primary_owner, если его нет
-    if car.primary_owner_uid not in users_map:
-        po = getattr(car, "primary_owner", None)
-        users_map[car.primary_owner_uid] = UserShortSchema(
+        car.primary_owner_uid: UserShortSchema(
             uid=car.primary_owner_uid,
             email=getattr(po, "email", "unknown@email.com"),
             username=getattr(po, "username", "Unknown"),
         )
-
-    # Добавим secondary_owners, если их нет
+    }
     for owner in car.secondary_owners:
-        if owner.uid not in users_map:
-            users_map[owner.uid] = UserShortSchema(
-                uid=owner.uid,
-                email=owner.email or "unknown@email.com",
-                username=owner.username or "Unknown",
-            )
+        users_map[owner.uid] = UserShortSchema(
+            uid=owner.uid,
+            email=owner.email or "unknown@email.com",
+            username=owner.username or "Unknown",
+        )
 
     return [
         OwnerStats(
@@ -110,9 +76,9 @@ def build_owners_stats(
     ]
 
 
-def calculate_stats(car: CarSchema) -> CarStats:
+@timed("stats")
+def calculate_stats(car: CarSchema, expenses_by_user: dict[UUID, int]) -> CarStats:
     metrics = calculate_car_metrics(car)
-    expenses_by_user = get_expenses_by_owner(car)
     owners_stats = build_owners_stats(car, expenses_by_user, metrics["profit"])
 
     owners_uids = [car.primary_owner_uid] + [
@@ -140,6 +106,8 @@ class CarService(BaseService[CarsRepository]):
     def __init__(self, repository: CarsRepository, dir_service: DirectoryService):
         super().__init__(repository)
         self.dir_service = dir_service
+        # One instance per request, access checks are cached for its duration
+        self._car_access: set[tuple[UUID, UUID]] = set()
 
     # Create a Car
     async def create_car(
@@ -147,16 +115,15 @@ class CarService(BaseService[CarsRepository]):
         car_data: CarCreateSchema,
         primary_owner_uid: UUID,
     ):
-        vin_collision = await self.repository.check_vin_collision(car_data.vin)
-        if vin_collision:
-            raise VinBusyException
         await self.dir_service.validate_make_model(car_data.make, car_data.model)
 
         new_car_dict = car_data.model_dump()
         new_car_dict["make"] = normalize_make_model(car_data.make)
         new_car_dict["model"] = normalize_make_model(car_data.model)
         new_car_dict["primary_owner_uid"] = primary_owner_uid
-        car = await self.repository.create(table=Cars, new_entity_dict=new_car_dict)
+        car = await self.repository.create_car(new_car_dict)
+        if car is None:
+            raise VinBusyException
         return car
 
     async def get_my_cars(
@@ -167,37 +134,47 @@ class CarService(BaseService[CarsRepository]):
         sort_by: str = "created_at",
         allowed_sort_fields: Optional[list[str]] = None,
         order: str = "desc",
+        keyset: bool = False,
+        cursor: Optional[str] = None,
+        total: str = "exact",
     ):
         offset_page = (page - 1) * limit
+        keyset = keyset or cursor is not None
 
         if allowed_sort_fields and sort_by not in allowed_sort_fields:
             raise HTTPException(
                 status_code=400, detail=f"Sorting by '{sort_by}' is not allowed."
             )
-        cars = await self.repository.get_my_cars(
+        cars, total_records = await self.repository.get_my_cars(
             offset_page=offset_page,
             limit=limit,
             sort_by=sort_by,
             order=order,
             owner_uid=owner_uid,
+            keyset=keyset,
+            cursor=cursor,
+            total=total,
         )
+        next_cursor = None
+        if keyset:
+            cars, next_cursor = split_keyset_page(cars, limit, sort_by, order)
 
-        total_records = await self.repository.count_my_cars(owner_uid)
-        total_pages = math.ceil(total_records / limit)
-        return PageResponse(
-            page_number=page,
-            page_size=limit,
-            total_pages=total_pages,
-            total_records=total_records,
-            content=cars,
+        return self.build_page(cars, total_records, page, limit, next_cursor, total)
+
+    async def get_cars_stats(self, cars: list[Cars]) -> dict[UUID, CarStats]:
+        """Stats for a batch of cars, owners' expenses come from one grouped query"""
+        expenses_by_owner = await self.repository.get_expenses_by_owner(
+            [car.uid for car in cars]
         )
+        return {
+            car.uid: calculate_stats(car, expenses_by_owner[car.uid]) for car in cars
+        }
 
     async def get_car_all_owners(self, car_uid: str, current_user: UserSchema):
         car = await self.get_by_uid(
             Cars,
             car_uid,
             options=[
-                selectinload(Cars.expenses).joinedload(Expenses.user),
                 selectinload(Cars.secondary_owners),
                 selectinload(Cars.primary_owner),
             ],
@@ -213,21 +190,33 @@ class CarService(BaseService[CarsRepository]):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
                 )
-        stats = calculate_stats(car)
+        stats = (await self.get_cars_stats([car]))[car.uid]
         return CarSchema.model_validate(car, from_attributes=True).model_copy(
             update={"stats": stats}
         )
 
+    async def check_car_access(self, car_uid: str, current_user: UserSchema) -> None:
+        """Owners and admins only, without loading the car"""
+        car_uuid = UUID(str(car_uid))
+        if (car_uuid, current_user.uid) in self._car_access:
+            return
+        is_owner = await self.repository.check_car_membership(
+            car_uuid, current_user.uid
+        )
+        if is_owner is None:
+            raise EntityNotFoundException(f"{Cars.__name__}-uid")
+        if not is_owner and current_user.role != UserRole.ADMIN:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
+            )
+        self._car_access.add((car_uuid, current_user.uid))
+
     async def get_car_with_primary_owner_check(
         self, car_uid: str, current_user: UserSchema
     ):
         car = await self.get_by_uid(
             table=Cars,
             uid=car_uid,
-            options=[
-                selectinload(Cars.secondary_owners),
-                selectinload(Cars.expenses).joinedload(Expenses.user),
-            ],
         )
 
         if not car:
@@ -272,8 +261,13 @@ class CarService(BaseService[CarsRepository]):
     async def update_car(
         self, car_uid: UUID, car_data: CarUpdateSchema, current_user: UserSchema
     ) -> Cars:
-        await self.get_car_all_owners(car_uid=car_uid, current_user=current_user)
-        return await self.update_by_uid(Cars, car_uid, car_data)
+        await self.check_car_access(car_uid=car_uid, current_user=current_user)
+        return await self.update_by_uid(
+            Cars,
+            car_uid,
+            car_data,
+            options=[selectinload(Cars.secondary_owners)],
+        )
 
     async def delete_car(self, car_uid: UUID, current_user: UserSchema) -> None:
         await self.get_car_with_primary_owner_check(car_uid, current_user)
@@ -286,17 +280,29 @@ class CarService(BaseService[CarsRepository]):
     ):
 
         offset_page = (filter_schema.page - 1) * filter_schema.limit
+        keyset = (
+            filter_schema.pagination == "cursor" or filter_schema.cursor is not None
+        )
 
-        cars = await self.repository.get_cars_filtered(offset_page, filter_schema)
+        cars, total_records = await self.repository.get_cars_filtered(
+            offset_page, filter_schema, keyset=keyset
+        )
+        next_cursor = None
+        if keyset:
+            cars, next_cursor = split_keyset_page(
+                cars,
+                filter_schema.limit,
+                filter_schema.sort_by,
+                filter_schema.order_desc,
+            )
 
-        total_records = await self.repository.count_filtered_records(filter_schema)
-        total_pages = math.ceil(total_records / filter_schema.limit)
-        return PageResponse(
-            page_number=filter_schema.page,
-            page_size=filter_schema.limit,
-            total_pages=total_pages,
-            total_records=total_records,
-            content=cars,
+        return self.build_page(
+            cars,
+            total_records,
+            filter_schema.page,
+            filter_schema.limit,
+            next_cursor,
+            filter_schema.total,
         )
 
 
@@ -311,7 +317,7 @@ class ExpensesService(BaseService[ExpensesRepository]):
     async def create_expense(
         self, car_uid: UUID, exp_data: ExpensesCreateSchema, current_user: UserSchema
     ) -> Expenses:
-        await self.car_service.get_car_all_owners(
+        await self.car_service.check_car_access(
             car_uid=car_uid, current_user=current_user
         )
         exp_data_dict = exp_data.model_dump()
@@ -323,7 +329,7 @@ class ExpensesService(BaseService[ExpensesRepository]):
     async def get_single_expense(
         self, car_uid: UUID, exp_uid: str, current_user: UserSchema
     ) -> Expenses:
-        await self.car_service.get_car_all_owners(
+        await self.car_service.check_car_access(
             car_uid=car_uid, current_user=current_user
         )
         exp = await self.repository.get_single_exp(car_uid, exp_uid)
@@ -348,6 +354,9 @@ class ExpensesService(BaseService[ExpensesRepository]):
         updated_exp = await self.repository.update_single_exp(
             car_uid, exp_uid, update_data_dict
         )
+        if not updated_exp:
+            # deleted after the access check
+            raise EntityNotFoundException("exp_uid")
         return updated_exp
 
     # Delete single expense
@@ -378,40 +387,43 @@ class ExpensesService(BaseService[ExpensesRepository]):
         sort_by: str = "created_at",
         allowed_sort_fields: Optional[list[str]] = None,
         order: str = "desc",
+        keyset: bool = False,
+        cursor: Optional[str] = None,
+        total: str = "exact",
     ) -> list[Expenses]:
-        await self.car_service.get_car_all_owners(
+        await self.car_service.check_car_access(
             car_uid=car_uid, current_user=current_user
         )
 
         offset_page = (page - 1) * limit
+        keyset = keyset or cursor is not None
 
         if allowed_sort_fields and sort_by not in allowed_sort_fields:
             raise HTTPException(
                 status_code=400, detail=f"Sorting by '{sort_by}' is not allowed."
             )
-        expenses = await self.repository.get_exp_by_car_uid(
+        expenses, total_records = await self.repository.get_exp_by_car_uid(
             car_uid=car_uid,
             offset_page=offset_page,
             limit=limit,
             sort_by=sort_by,
             order=order,
+            keyset=keyset,
+            cursor=cursor,
+            total=total,
         )
+        next_cursor = None
+        if keyset:
+            expenses, next_cursor = split_keyset_page(expenses, limit, sort_by, order)
 
-        total_records = await self.repository.count_exp_by_car_uid(car_uid)
-        total_pages = math.ceil(total_records / limit)
-
-        return PageResponse(
-            page_number=page,
-            page_size=limit,
-            total_pages=total_pages,
-            total_records=total_records,
-            content=expenses,
-        )
+        return self.build_page(expenses, total_records, page, limit, next_cursor, total)
 
     # Delete all expenses for a single car
     async def delete_all_expenses_by_car_uid(
         self, car_uid: UUID, current_user: UserSchema
     ) -> None:
-        await self.get_expenses_by_car_uid(car_uid, current_user)
+        await self.car_service.check_car_access(
+            car_uid=car_uid, current_user=current_user
+        )
         await self.repository.delete_exp_by_car_uid(car_uid)
         return True
@@ -19,6 +19,35 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str
     TESTING: bool = False
 
+    # Database engine / pool
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 1800  # seconds
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT: int = 30000  # milliseconds, 0 - disabled
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100  # asyncpg, 0 - disabled
+
+    # In-memory make/model index
+    # Seconds between reloads, 0 - never reload. load_directory() in the same
+    # process invalidates at once, running workers pick changes up by TTL
+    DIRECTORY_INDEX_TTL: int = 300
+
+    # Request instrumentation
+    DB_QUERY_WARN_COUNT: int = 25  # statements per request logged as a warning
+
+    # Slow query log
+    SLOW_QUERY_THRESHOLD_MS: float = 0  # 0 - disabled
+    SLOW_QUERY_EXPLAIN: bool = True
+    SLOW_QUERY_EXPLAIN_ANALYZE: bool = False  # PostgreSQL, SELECTs only
+    SLOW_QUERY_LOG_FILE: str = "logs/slow_queries.log"  # relative to BASE_DIR
+    SLOW_QUERY_LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUP_COUNT: int = 5
+
+    # Admin request profiler
+    PROFILE_DIR: str = "profiles"  # relative to BASE_DIR
+    PROFILE_SAMPLING_INTERVAL: float = 0.001  # seconds
+
 
 Config = Settings()
 
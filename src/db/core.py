@@ -1,19 +1,130 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
 from sqlmodel import SQLModel
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.orm import sessionmaker
 from src.config import Config
-from typing import AsyncGenerator
+from src.db.slow_queries import log_slow_query
+from src.utils.metrics import MeteredQueuePool
+from typing import AsyncGenerator, Iterator, Optional
+
+engine: Optional[AsyncEngine] = None
+session_factory: Optional[async_sessionmaker[AsyncSession]] = None
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0  # seconds
+    statements: list[str] | None = None  # only when tracked with record=True
+
+
+# Trackers of the current request/test, innermost last
+_active_stats: ContextVar[tuple[QueryStats, ...]] = ContextVar(
+    "active_query_stats", default=()
+)
+
+
+@contextmanager
+def track_queries(record: bool = False) -> Iterator[QueryStats]:
+    """Count statements executed in the current context, nested trackers
+    see the same statements"""
+    stats = QueryStats(statements=[] if record else None)
+    token = _active_stats.set(_active_stats.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    # Kept on the execution context: nothing to clean up if the statement fails
+    context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    elapsed = time.perf_counter() - context.query_started
+    if (
+        Config.SLOW_QUERY_THRESHOLD_MS
+        and elapsed * 1000 >= Config.SLOW_QUERY_THRESHOLD_MS
+    ):
+        log_slow_query(conn, statement, parameters, many, elapsed)
+    for stats in _active_stats.get():
+        stats.count += 1
+        stats.duration += elapsed
+        if stats.statements is not None:
+            stats.statements.append(statement)
+
+
+def instrument_engine(engine: AsyncEngine) -> AsyncEngine:
+    """Feed statement counts and DB time to the active trackers"""
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+
+def create_engine_from_config(database_url: str = None) -> AsyncEngine:
+    url = make_url(database_url or Config.DATABASE_URL)
+    engine_kwargs = {"echo": Config.DB_ECHO}
+    # Pool and server-side settings only make sense for PostgreSQL;
+    # SQLite (tests) keeps SQLAlchemy defaults
+    if url.get_backend_name() == "postgresql":
+        engine_kwargs.update(
+            poolclass=MeteredQueuePool,
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_recycle=Config.DB_POOL_RECYCLE,
+            pool_pre_ping=Config.DB_POOL_PRE_PING,
+        )
+        if url.get_driver_name() == "asyncpg":
+            url = url.update_query_dict(
+                {
+                    "prepared_statement_cache_size": str(
+                        Config.DB_PREPARED_STATEMENT_CACHE_SIZE
+                    )
+                }
+            )
+            engine_kwargs["connect_args"] = {
+                "server_settings": {
+                    "statement_timeout": str(Config.DB_STATEMENT_TIMEOUT)
+                }
+            }
+    return create_async_engine(url, **engine_kwargs)
+
+
+def init_engine() -> AsyncEngine:
+    """Create the engine and session factory once per process"""
+    global engine, session_factory
+    if engine is None:
+        engine = instrument_engine(create_engine_from_config())
+        session_factory = async_sessionmaker(
+            bind=engine, class_=AsyncSession, expire_on_commit=False
+        )
+    return engine
+
 
-engine = create_async_engine(url=Config.DATABASE_URL, echo=True)
+async def dispose_engine():
+    global engine, session_factory
+    if engine is not None:
+        await engine.dispose()
+    engine = None
+    session_factory = None
 
 
 async def init_db():
-    async with engine.begin() as conn:
+    async with init_engine().begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
-    async with Session() as session:
+    if session_factory is None:
+        init_engine()
+    async with session_factory() as session:
         yield session
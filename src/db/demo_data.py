@@ -1,160 +1,424 @@
-from datetime import datetime
-from time import time
-from typing import Dict, List
-from uuid import uuid4
+"""Синтетические данные для нагрузочного тестирования.
+
+    python -m src.db.demo_data --users 100000 --cars 1000000 --workers 8
+
+Пользователи, автомобили (марки/модели из справочника), совладельцы и
+расходы генерируются в пуле процессов пачками и загружаются через COPY
+(PostgreSQL + asyncpg). Пароль всех пользователей - DEMO_PASSWORD.
+"""
+
+import argparse
+import asyncio
+import os
 import random
+import string
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from time import time
+from uuid import NAMESPACE_URL, UUID, uuid4, uuid5
+
 from faker import Faker
-from sqlalchemy import insert
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection
 
-from src.cars.models import Cars, Expenses
-from src.cars.schemas import CarStatusChoices
+from src.auth.utils import gen_pwd_hash
+from src.cars.schemas import CarStatusChoices, ExpenseType
+from src.db.core import dispose_engine, init_engine
+from src.directories.models import MakesDirectory, ModelsDirectory
+from src.users.schemas import UserRole
 
-from sqlalchemy.ext.asyncio import AsyncSession
-from src.db.core import engine
-import asyncio
+DEMO_PASSWORD = "demo-password"
 
-fake = Faker("ru_RU")  # Для русскоязычных данных
-
-
-def generate_expenses(count: int):
-    """Генерирует список расходов"""
-    expense_names = [
-        "Покраска",
-        "Замена масла",
-        "Ремонт подвески",
-        "Шиномонтаж",
-        "Химчистка",
-        "Полировка",
-        "Замена стекла",
-        "Ремонт АКПП",
-        "Тонировка",
-    ]
-    return [
-        Expenses(
-            name=random.choice(expense_names), exp_summ=random.randint(5000, 50000)
-        )
-        for _ in range(count)
-    ]
+USER_COLUMNS = [
+    "uid",
+    "role",
+    "username",
+    "email",
+    "first_name",
+    "last_name",
+    "is_verified",
+    "password_hash",
+    "created_at",
+    "updated_at",
+]
+CAR_COLUMNS = [
+    "uid",
+    "status",
+    "make",
+    "model",
+    "year",
+    "vin",
+    "pts_num",
+    "sts_num",
+    "date_purchased",
+    "date_listed",
+    "price_listed",
+    "date_sold",
+    "price_sold",
+    "autoteka_link",
+    "notes",
+    "avito_link",
+    "autoru_link",
+    "drom_link",
+    "purchase_total",
+    "expenses_total",
+    "total_cost",
+    "profit",
+    "margin",
+    "potential_profit",
+    "potential_margin",
+    "created_at",
+    "updated_at",
+    "primary_owner_uid",
+]
+LINK_COLUMNS = ["user_uid", "car_uid"]
+EXPENSE_COLUMNS = [
+    "uid",
+    "type",
+    "name",
+    "exp_summ",
+    "created_at",
+    "car_uid",
+    "user_uid",
+]
+
+# Статусы и типы расходов с весами, похожими на реальный парк перекупа
+STATUS_WEIGHTS = {
+    CarStatusChoices.FRESH: 10,
+    CarStatusChoices.REPAIRING: 10,
+    CarStatusChoices.DETAILING: 5,
+    CarStatusChoices.LISTED: 20,
+    CarStatusChoices.SOLD: 55,
+}
+EXPENSE_NAMES = {
+    ExpenseType.PARTS: ["Запчасти", "Тормозные колодки", "Аккумулятор"],
+    ExpenseType.WHEELS: ["Шиномонтаж", "Комплект резины"],
+    ExpenseType.REPAIR: ["Ремонт подвески", "Ремонт АКПП", "Замена масла"],
+    ExpenseType.PAINT: ["Покраска", "Полировка"],
+    ExpenseType.FUEL: ["Топливо"],
+    ExpenseType.DETAILING: ["Химчистка", "Тонировка"],
+    ExpenseType.ADS: ["Продвижение объявления"],
+    ExpenseType.OTHER: ["Эвакуатор", "Диагностика", "Замена стекла"],
+}
+# Chunks submitted to the pool per worker: keeps workers busy while the
+# loader copies, without holding every generated chunk in memory
+IN_FLIGHT_PER_WORKER = 2
+VIN_ALPHABET = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+PTS_LETTERS = "АВЕКМНОРСТУХ"
+
+
+@dataclass
+class GeneratorOptions:
+    users: int
+    cars: int
+    max_secondary_owners: int
+    expenses_per_car: float
+    run_id: str
+    seed: int
+
+
+def user_uid(options: GeneratorOptions, index: int) -> UUID:
+    """Uid of the n-th generated user, computable in any worker process"""
+    return uuid5(NAMESPACE_URL, f"demo/{options.run_id}/user/{index}")
 
 
 def generate_pts_num() -> str:
-    """Генерирует номер ПТС в формате 12АБ 123456 или 12аб123456"""
-    digits_part1 = f"{random.randint(10, 99)}"  # 2 цифры
-    letters = "".join(
-        random.choices(
-            "АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯабвгдеёжзийклмнопрстуфхцчшщъыьэюя", k=2
+    """Генерирует номер ПТС в формате 12АБ 123456 или 12АБ123456"""
+    space = " " if random.random() < 0.5 else ""
+    letters = "".join(random.choices(PTS_LETTERS, k=2))
+    return f"{random.randint(10, 99)}{letters}{space}{random.randint(100000, 999999)}"
+
+
+def generate_sts_num() -> str:
+    """Генерирует номер СТС в формате 9999 999999"""
+    return f"{random.randint(1000, 9999)} {random.randint(100000, 999999)}"
+
+
+def generate_vin() -> str:
+    return "".join(random.choices(VIN_ALPHABET, k=17))
+
+
+def random_datetime(start: datetime, end: datetime) -> datetime:
+    return start + timedelta(seconds=random.uniform(0, (end - start).total_seconds()))
+
+
+def margin(profit: int, total_cost: int) -> float:
+    # Same rounding as the aggregates kept by the cars repository
+    if total_cost == 0:
+        return 0.0
+    value = Decimal(profit * 100) / Decimal(total_cost)
+    return float(value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def generate_users(options: GeneratorOptions, start: int, stop: int, pwd_hash: str):
+    random.seed(f"{options.seed}/users/{start}")
+    fake = Faker("ru_RU")
+    fake.seed_instance(f"{options.seed}/users/{start}")
+    now = datetime.now()
+    rows = []
+    for index in range(start, stop):
+        created_at = random_datetime(now - timedelta(days=5 * 365), now)
+        rows.append(
+            (
+                user_uid(options, index),
+                UserRole.USER.name,
+                f"demo_{options.run_id}_{index}",
+                f"demo_{options.run_id}_{index}@example.com",
+                fake.first_name(),
+                fake.last_name(),
+                random.random() < 0.7,
+                pwd_hash,
+                created_at,
+                None,
+            )
         )
-    )  # 2 русские буквы
-    digits_part2 = f"{random.randint(100000, 999999)}"  # 6 цифр
-    space = " " if random.choice([True, False]) else ""  # Случайный пробел
+    return rows
 
-    return f"{digits_part1}{letters}{space}{digits_part2}"
 
+def generate_cars(
+    options: GeneratorOptions,
+    start: int,
+    stop: int,
+    makes: list[str],
+    make_weights: list[float],
+    models_by_make: dict[str, list[str]],
+):
+    """Cars with their ownership links and expenses, aggregates included"""
+    random.seed(f"{options.seed}/cars/{start}")
+    fake = Faker("ru_RU")
+    fake.seed_instance(f"{options.seed}/cars/{start}")
+    today = date.today()
+    now = datetime.now()
+    statuses = list(STATUS_WEIGHTS)
+    status_weights = list(STATUS_WEIGHTS.values())
+    expense_types = list(EXPENSE_NAMES)
+    cars, links, expenses = [], [], []
 
-def generate_sts_num() -> str:
-    """Генерирует номер СТС в формате 9999 999999 (4 цифры, пробел, 6 цифр)"""
-    part1 = f"{random.randint(1000, 9999)}"  # 4 цифры
-    part2 = f"{random.randint(100000, 999999)}"  # 6 цифр
-    return f"{part1} {part2}"  # Всегда с пробелом (можно сделать опциональным)
-
-
-def generate_car():
-    """Генерирует один автомобиль с заданным статусом"""
-    base_price = random.randint(500000, 5000000)
-    date_purchased = fake.date_between(start_date="-20y", end_date="today")
-    status = random.choice(
-        [
-            CarStatusChoices.FRESH,
-            CarStatusChoices.REPAIRING,
-            CarStatusChoices.DETAILING,
-            CarStatusChoices.LISTED,
-            CarStatusChoices.SOLD,
-        ]
-    )
+    for _ in range(start, stop):
+        car_uid = uuid4()
+        make = random.choices(makes, weights=make_weights)[0]
+        model = random.choice(models_by_make[make])
+        status = random.choices(statuses, weights=status_weights)[0]
+        # Перекупы с первыми номерами владеют большим числом машин
+        owners = [user_uid(options, int(options.users * random.random() ** 2))]
+        for _ in range(
+            random.choices(
+                range(options.max_secondary_owners + 1),
+                weights=[8] + [1] * options.max_secondary_owners,
+            )[0]
+        ):
+            secondary = user_uid(options, random.randrange(options.users))
+            if secondary not in owners:
+                owners.append(secondary)
+                links.append((secondary, car_uid))
 
-    car = Cars(
-        uid=uuid4(),
-        make=fake.random_element(
-            ["Toyota", "BMW", "Mercedes", "Audi", "Ford", "Kia", "Hyundai"]
-        ),
-        model=fake.random_element(
-            ["Camry", "X5", "C-Class", "A6", "Focus", "Rio", "Solaris"]
-        ),
-        year=int(
-            fake.date_between(start_date="-13y", end_date="today").year
-        ),  # Исправлено здесь
-        vin=fake.vin(),
-        pts_num=generate_pts_num(),
-        sts_num=generate_sts_num(),
-        date_purchased=date_purchased,
-        price_purchased=base_price,
-        status=status.value,
-        created_at=datetime.now(),
-    )
-    car.date_listed = fake.date_between(start_date=date_purchased, end_date="today")
-    listed_price = base_price + random.randint(50000, 500000)
-    car.price_listed = listed_price
-    car.date_sold = fake.date_between(start_date=car.date_listed, end_date="today")
-    car.price_sold = random.randint(
-        int(listed_price * 0.9), listed_price + random.randint(0, 100000)
-    )
-    car.avito_link = f"https://avito.ru/{fake.uri_path()}"
-    car.autoru_link = f"https://auto.ru/{fake.uri_path()}"
-    car.drom_link = f"https://drom.ru/{fake.uri_path()}"
-    car.autoteka_link = f"https://autoteka.ru/{fake.uri_path()}"
-    car.notes = fake.sentence(nb_words=6)
+        date_purchased = today - timedelta(days=random.randint(0, 5 * 365))
+        purchased_at = datetime.combine(date_purchased, datetime.min.time())
+        price_purchased = int(random.lognormvariate(13.8, 0.6)) // 1000 * 1000
+        expenses.append(
+            (
+                uuid4(),
+                ExpenseType.PURCHASE.name,
+                "Покупка",
+                price_purchased,
+                purchased_at,
+                car_uid,
+                owners[0],
+            )
+        )
+        expenses_total = 0
+        for _ in range(int(random.expovariate(1 / options.expenses_per_car))):
+            exp_type = random.choice(expense_types)
+            exp_summ = int(random.lognormvariate(9.5, 1.0)) // 100 * 100 + 100
+            expenses_total += exp_summ
+            expenses.append(
+                (
+                    uuid4(),
+                    exp_type.name,
+                    random.choice(EXPENSE_NAMES[exp_type]),
+                    exp_summ,
+                    random_datetime(purchased_at, now),
+                    car_uid,
+                    random.choice(owners),
+                )
+            )
+
+        total_cost = price_purchased + expenses_total
+        date_listed = price_listed = date_sold = price_sold = None
+        if status in (CarStatusChoices.LISTED, CarStatusChoices.SOLD):
+            date_listed = date_purchased + timedelta(
+                days=random.randint(0, (today - date_purchased).days)
+            )
+            price_listed = int(total_cost * random.uniform(1.05, 1.4)) // 1000 * 1000
+        if status == CarStatusChoices.SOLD:
+            date_sold = date_listed + timedelta(
+                days=random.randint(0, (today - date_listed).days)
+            )
+            price_sold = int(price_listed * random.uniform(0.85, 1.02)) // 1000 * 1000
+        profit = price_sold - total_cost if price_sold is not None else 0
+        potential_profit = price_listed - total_cost if price_listed is not None else 0
+        has_links = date_listed is not None
 
-    return car
+        cars.append(
+            (
+                car_uid,
+                status.name,
+                make,
+                model,
+                random.randint(max(1970, today.year - 25), today.year),
+                generate_vin(),
+                generate_pts_num(),
+                generate_sts_num(),
+                date_purchased,
+                date_listed,
+                price_listed,
+                date_sold,
+                price_sold,
+                f"https://autoteka.ru/report/{car_uid.hex}" if has_links else None,
+                fake.sentence(nb_words=6) if random.random() < 0.2 else None,
+                f"https://avito.ru/{car_uid.hex}" if has_links else None,
+                f"https://auto.ru/{car_uid.hex}" if has_links else None,
+                f"https://drom.ru/{car_uid.hex}" if has_links else None,
+                price_purchased,
+                expenses_total,
+                total_cost,
+                profit,
+                margin(profit, total_cost),
+                potential_profit,
+                margin(potential_profit, total_cost),
+                purchased_at,
+                random_datetime(purchased_at, now),
+                owners[0],
+            )
+        )
+    return cars, links, expenses
 
 
-def generate_demo_cars(quantity: int):
-    """Генерирует 50 тестовых автомобилей"""
-    cars = []
+async def copy_rows(conn: AsyncConnection, table: str, columns: list, rows: list):
+    if not rows:
+        return
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        table, records=rows, columns=columns
+    )
 
-    for _ in range(quantity):  # SOLD
-        car = generate_car()
-        if random.random() > 0.3:
-            car.expenses = generate_expenses(random.randint(1, 5))
-        cars.append(car)
 
-    return cars
+async def load_directory_weights(conn: AsyncConnection):
+    """Makes with Zipf-like popularity, in directory order"""
+    result = await conn.execute(
+        select(MakesDirectory.make, ModelsDirectory.model)
+        .join(ModelsDirectory, ModelsDirectory.make_uid == MakesDirectory.uid)
+        .order_by(MakesDirectory.make, ModelsDirectory.model)
+    )
+    models_by_make: dict[str, list[str]] = {}
+    for make, model in result.all():
+        models_by_make.setdefault(make, []).append(model)
+    if not models_by_make:
+        raise RuntimeError("Справочник марок пуст, сначала src.directories.utils")
+    makes = list(models_by_make)
+    random.Random(0).shuffle(makes)
+    make_weights = [1 / rank for rank in range(1, len(makes) + 1)]
+    return makes, make_weights, models_by_make
 
 
-async def bulk_insert(session: AsyncSession, car_data: List[Dict]):
-    await session.execute(insert(Cars), car_data)
-    await session.commit()
+def chunks(total: int, size: int):
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
 
 
-async def main():
-    total_records = 500
-    batch_size = 500
-    batches = total_records // batch_size
+async def run_bounded(pool, func, jobs: list[tuple], limit: int):
+    """Results of func(*job) in completion order. At most limit jobs are
+    in the pool at a time, the next one is submitted as each finishes"""
+    loop = asyncio.get_running_loop()
+    jobs = iter(jobs)
+    running = set()
+    while True:
+        for job in jobs:
+            running.add(loop.run_in_executor(pool, func, *job))
+            if len(running) >= limit:
+                break
+        if not running:
+            return
+        done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
 
-    async with AsyncSession(engine) as session:
 
-        print(f"Начинаю генерацию и вставку {total_records:,} автомобилей")
-        start_time = time()
-        for i in range(batches):
+async def generate(options: GeneratorOptions, workers: int, chunk_size: int):
+    engine = init_engine()
+    if engine.dialect.name != "postgresql" or engine.dialect.driver != "asyncpg":
+        raise RuntimeError("Загрузка через COPY требует PostgreSQL + asyncpg")
+    loop = asyncio.get_running_loop()
+    pwd_hash = gen_pwd_hash(DEMO_PASSWORD)
+    async with engine.connect() as conn:
+        directory = await load_directory_weights(conn)
 
-            start_gen_time = time()
-            batch = generate_demo_cars(batch_size)
-            total_gen_time = time() - start_gen_time
+    started = time()
+    workers = workers or os.cpu_count() or 1
+    limit = workers * IN_FLIGHT_PER_WORKER
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Users first: cars reference them
+        user_jobs = [
+            (options, start, stop, pwd_hash)
+            for start, stop in chunks(options.users, chunk_size)
+        ]
+        done = 0
+        async for rows in run_bounded(pool, generate_users, user_jobs, limit):
+            async with engine.begin() as conn:
+                await copy_rows(conn, "users", USER_COLUMNS, rows)
+            done += 1
+            print(f"users: пачка {done}/{len(user_jobs)}, {time() - started:.1f} сек")
 
-            start_insert_time = time()
-            await bulk_insert(session, batch)
-            total_insert_time = time() - start_insert_time
+        car_jobs = [
+            (options, start, stop, *directory)
+            for start, stop in chunks(options.cars, chunk_size)
+        ]
+        done = 0
+        async for cars, links, expenses in run_bounded(
+            pool, generate_cars, car_jobs, limit
+        ):
+            async with engine.begin() as conn:
+                await copy_rows(conn, "cars", CAR_COLUMNS, cars)
+                await copy_rows(conn, "car_user_link", LINK_COLUMNS, links)
+                await copy_rows(conn, "expenses", EXPENSE_COLUMNS, expenses)
+            done += 1
             print(
-                f"Вставлено {(i+1)*batch_size} записей."
-                f"Генерация текущего пакета заняла: {total_gen_time:.2f} сек,"
-                f"Вставка текущего пакета заняла: {total_insert_time:.2f} сек"
+                f"cars: пачка {done}/{len(car_jobs)} "
+                f"({len(cars)} авто, {len(links)} совладельцев, "
+                f"{len(expenses)} расходов), {time() - started:.1f} сек"
             )
-        remaining = total_records % batch_size
-        if remaining > 0:
-            batch = generate_demo_cars(remaining)
-            await bulk_insert(session, batch)
-    total_time = time() - start_time
-    print(f"Записи вставлены! Время выполнения: {total_time:.2f}сек.")
+    await dispose_engine()
+    print(f"Готово за {time() - started:.1f} сек, run_id={options.run_id}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Генератор демо-данных")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--cars", type=int, default=5000)
+    parser.add_argument("--max-secondary-owners", type=int, default=2)
+    parser.add_argument(
+        "--expenses-per-car", type=float, default=8, help="Среднее, без покупки"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--run-id",
+        default="".join(random.choices(string.ascii_lowercase, k=6)),
+        help="Префикс имён пользователей, разный для каждого запуска",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    options = GeneratorOptions(
+        users=args.users,
+        cars=args.cars,
+        max_secondary_owners=args.max_secondary_owners,
+        expenses_per_car=args.expenses_per_car,
+        run_id=args.run_id,
+        seed=args.seed,
+    )
+    asyncio.run(generate(options, args.workers, args.chunk_size))
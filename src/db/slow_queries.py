@@ -0,0 +1,127 @@
+import functools
+import inspect
+import logging
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from src.config import BASE_DIR, Config
+
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+# Repository methods on the way to the current statement, outermost first
+_query_origin: ContextVar[tuple[str, ...]] = ContextVar("query_origin", default=())
+
+logger = logging.getLogger(__name__)
+logger.propagate = False
+
+
+def traced(method):
+    """Remember the repository method a statement is issued from"""
+    name = method.__qualname__
+
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = _query_origin.set(_query_origin.get() + (name,))
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            _query_origin.reset(token)
+
+    return wrapper
+
+
+def trace_methods(cls):
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(attr):
+            setattr(cls, name, traced(attr))
+    return cls
+
+
+def _log_path() -> Path:
+    path = Path(Config.SLOW_QUERY_LOG_FILE)
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+def _get_logger() -> logging.Logger:
+    # Configured on first use: the file is only created once a query is slow
+    path = _log_path()
+    handler = logger.handlers[0] if logger.handlers else None
+    if handler is None or handler.baseFilename != str(path):
+        if handler is not None:
+            logger.removeHandler(handler)
+            handler.close()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=Config.SLOW_QUERY_LOG_MAX_BYTES,
+            backupCount=Config.SLOW_QUERY_LOG_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.WARNING)
+    return logger
+
+
+def parameters_shape(parameters, executemany: bool) -> str:
+    """Types of the bound values, never the values themselves"""
+    if executemany:
+        rows = list(parameters)
+        first = parameters_shape(rows[0], False) if rows else "[]"
+        return f"{len(rows)} x {first}"
+    if isinstance(parameters, dict):
+        items = ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items())
+        return f"{{{items}}}"
+    if isinstance(parameters, (list, tuple)):
+        return f"[{', '.join(type(v).__name__ for v in parameters)}]"
+    return type(parameters).__name__
+
+
+def explain(conn, statement: str, parameters) -> list[str]:
+    """Plan of a statement that has just run, on the same connection.
+    On PostgreSQL it runs inside a savepoint that is always rolled back,
+    so neither ANALYZE nor a failing EXPLAIN affects the transaction"""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        analyze = Config.SLOW_QUERY_EXPLAIN_ANALYZE and statement.lstrip()[
+            :6
+        ].upper().startswith(("SELECT", "WITH"))
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+    elif dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return []
+
+    cursor = conn.connection.cursor()
+    try:
+        if dialect == "postgresql":
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        finally:
+            if dialect == "postgresql":
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+    finally:
+        cursor.close()
+    return [str(row[-1]) for row in rows]
+
+
+def log_slow_query(conn, statement: str, parameters, executemany: bool, elapsed):
+    origin = " > ".join(_query_origin.get()) or "unknown"
+    lines = [
+        f"slow query {elapsed * 1000:.2f} ms in {origin}",
+        f"parameters: {parameters_shape(parameters, executemany)}",
+        statement.strip(),
+    ]
+    if (
+        Config.SLOW_QUERY_EXPLAIN
+        and not executemany
+        and statement.lstrip()[:6].upper().startswith(EXPLAINABLE)
+    ):
+        try:
+            lines += ["plan:"] + explain(conn, statement, parameters)
+        except Exception as e:
+            lines.append(f"plan: EXPLAIN failed: {e!r}")
+    _get_logger().warning("\n".join(lines))
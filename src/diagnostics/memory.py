@@ -0,0 +1,78 @@
+import tracemalloc
+
+from fastapi import HTTPException, status
+
+# Allocations of the tracer itself and of imports are noise
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+class MemoryTracker:
+    """tracemalloc of this worker process: start, snapshot diffs, stop.
+    Only the baseline and the previous snapshot are kept"""
+
+    def __init__(self):
+        self.baseline: tracemalloc.Snapshot | None = None
+        self.previous: tracemalloc.Snapshot | None = None
+        self.snapshots = 0
+
+    def status(self) -> dict:
+        tracing = tracemalloc.is_tracing()
+        result = {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit(),
+            "snapshots": self.snapshots,
+        }
+        if tracing:
+            result["current"], result["peak"] = tracemalloc.get_traced_memory()
+        return result
+
+    def _require_tracing(self, tracing: bool):
+        if tracemalloc.is_tracing() != tracing:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"tracemalloc is {'not ' if tracing else ''}running",
+            )
+
+    def _take(self) -> tracemalloc.Snapshot:
+        self.snapshots += 1
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def start(self, frames: int) -> dict:
+        self._require_tracing(False)
+        tracemalloc.start(frames)
+        self.snapshots = 0
+        self.baseline = self.previous = self._take()
+        return self.status()
+
+    def snapshot(self, compare_to: str, group_by: str, limit: int) -> dict:
+        self._require_tracing(True)
+        snapshot = self._take()
+        reference = self.baseline if compare_to == "baseline" else self.previous
+        self.previous = snapshot
+        top = [
+            {
+                "traceback": [
+                    f"{frame.filename}:{frame.lineno}" for frame in stat.traceback
+                ],
+                "size": stat.size,
+                "size_diff": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            }
+            for stat in snapshot.compare_to(reference, group_by)[:limit]
+        ]
+        return {"status": self.status(), "compared_to": compare_to, "top": top}
+
+    def stop(self) -> dict:
+        self._require_tracing(True)
+        tracemalloc.stop()
+        self.baseline = self.previous = None
+        return self.status()
+
+
+memory_tracker = MemoryTracker()
@@ -0,0 +1,42 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query
+
+from src.auth.dependencies import require_admin
+from src.diagnostics.memory import memory_tracker
+from src.diagnostics.schemas import MemoryStatus, SnapshotDiff
+from src.utils.schemas_common import ResponseSchema
+from src.utils.timing import TimedRoute
+
+diagnostics_router = APIRouter(
+    route_class=TimedRoute, dependencies=[Depends(require_admin)]
+)
+
+
+@diagnostics_router.get("/memory", response_model=ResponseSchema[MemoryStatus])
+async def get_memory_status():
+    return ResponseSchema(detail="Success", result=memory_tracker.status())
+
+
+@diagnostics_router.post("/memory/start", response_model=ResponseSchema[MemoryStatus])
+async def start_memory_tracing(
+    frames: int = Query(default=1, ge=1, le=25, description="Глубина traceback"),
+):
+    return ResponseSchema(detail="Success", result=memory_tracker.start(frames))
+
+
+@diagnostics_router.post(
+    "/memory/snapshot", response_model=ResponseSchema[SnapshotDiff]
+)
+async def take_memory_snapshot(
+    compare_to: Literal["baseline", "previous"] = Query(default="previous"),
+    group_by: Literal["lineno", "filename", "traceback"] = Query(default="lineno"),
+    limit: int = Query(default=20, ge=1, le=100),
+):
+    result = memory_tracker.snapshot(compare_to, group_by, limit)
+    return ResponseSchema(detail="Success", result=result)
+
+
+@diagnostics_router.post("/memory/stop", response_model=ResponseSchema[MemoryStatus])
+async def stop_memory_tracing():
+    return ResponseSchema(detail="Success", result=memory_tracker.stop())
@@ -0,0 +1,25 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class MemoryStatus(BaseModel):
+    tracing: bool
+    frames: int
+    current: int | None = None  # bytes traced now
+    peak: int | None = None  # since the last reset, requests reset it
+    snapshots: int = 0
+
+
+class AllocationSite(BaseModel):
+    traceback: list[str]
+    size: int
+    size_diff: int
+    count: int
+    count_diff: int
+
+
+class SnapshotDiff(BaseModel):
+    status: MemoryStatus
+    compared_to: Literal["baseline", "previous"]
+    top: list[AllocationSite]
@@ -0,0 +1,153 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+from bisect import bisect_left
+from typing import Optional
+from uuid import UUID
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import Config
+from src.directories.repositories import DirectoryRepository
+from src.directories.schemas import MakeSchema, ModelSchema
+from src.utils.exceptions import EntityNotFoundException
+from src.utils.normalize_make_model import normalize_make_model
+
+
+class PrefixIndex:
+    """Sorted array of case-folded names, prefix lookups by binary search"""
+
+    def __init__(self, items: list[tuple[str, object]]):
+        items = sorted(items, key=lambda item: (item[0].casefold(), item[0]))
+        self._keys = [name.casefold() for name, _ in items]
+        self._values = [value for _, value in items]
+
+    def search(self, prefix: str, limit: int) -> list:
+        prefix = prefix.strip().casefold()
+        start = bisect_left(self._keys, prefix)
+        end = start
+        stop = min(start + limit, len(self._keys))
+        while end < stop and self._keys[end].startswith(prefix):
+            end += 1
+        return self._values[start:end]
+
+
+class DirectorySnapshot:
+    """Whole directory as compact JSON: [[make_uid, make, [[model_uid, model], ...]], ...],
+    sorted, so every process produces the same bytes and ETag"""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.gzip_body = gzip.compress(body, mtime=0)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        # Each representation gets its own strong ETag
+        self.gzip_etag = f'"{digest}-gz"'
+
+    @classmethod
+    def build(cls, makes: list[list]) -> "DirectorySnapshot":
+        makes = sorted(makes, key=lambda make: (make[1], make[0]))
+        body = json.dumps(
+            {"detail": "Success", "result": makes},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return cls(body.encode("utf-8"))
+
+
+class MakeModelIndex:
+    """Process-local copy of the make/model directory: normalized make -> set
+    of normalized models for validation, prefix indexes for autocomplete"""
+
+    def __init__(self, ttl: int = Config.DIRECTORY_INDEX_TTL):
+        self.ttl = ttl
+        self._makes: Optional[dict[str, frozenset[str]]] = None
+        self._makes_search: Optional[PrefixIndex] = None
+        self._models_search: dict[UUID, PrefixIndex] = {}
+        self._snapshot: Optional[DirectorySnapshot] = None
+        self._loaded_at = 0.0
+        # Bumped by invalidate(); a load only counts as fresh for the
+        # generation it started in
+        self._generation = 0
+        self._loaded_generation = -1
+        self._lock = asyncio.Lock()
+
+    def is_stale(self) -> bool:
+        # An empty directory (not loaded yet at startup) is retried on every use
+        if not self._makes or self._loaded_generation != self._generation:
+            return True
+        return bool(self.ttl) and time.monotonic() - self._loaded_at > self.ttl
+
+    def invalidate(self):
+        """Force a reload on next use, after the directory has been changed.
+        Other processes only see the change after their TTL.
+        A load already in flight read the old rows and stays stale"""
+        self._generation += 1
+
+    async def load(self, session: AsyncSession):
+        generation = self._generation
+        rows = await DirectoryRepository(session).get_make_model_pairs()
+        makes: dict[str, set[str]] = {}
+        make_entries: dict[UUID, MakeSchema] = {}
+        model_entries: dict[UUID, list[tuple[str, ModelSchema]]] = {}
+        for make_uid, make, model_uid, model in rows:
+            models = makes.setdefault(normalize_make_model(make), set())
+            make_entries[make_uid] = MakeSchema(uid=make_uid, make=make)
+            entries = model_entries.setdefault(make_uid, [])
+            if model is not None:
+                models.add(normalize_make_model(model))
+                entries.append((model, ModelSchema(uid=model_uid, model=model)))
+        self._makes_search = PrefixIndex(
+            [(entry.make, entry) for entry in make_entries.values()]
+        )
+        self._models_search = {
+            make_uid: PrefixIndex(entries)
+            for make_uid, entries in model_entries.items()
+        }
+        self._snapshot = DirectorySnapshot.build(
+            [
+                [
+                    str(make_uid),
+                    entry.make,
+                    sorted([str(m.uid), m.model] for _, m in model_entries[make_uid]),
+                ]
+                for make_uid, entry in make_entries.items()
+            ]
+        )
+        self._makes = {make: frozenset(models) for make, models in makes.items()}
+        self._loaded_at = time.monotonic()
+        self._loaded_generation = generation
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if not self.is_stale():
+            return
+        async with self._lock:
+            if self.is_stale():
+                await self.load(session)
+
+    @property
+    def snapshot(self) -> DirectorySnapshot:
+        return self._snapshot
+
+    def validate(self, make: str, model: str):
+        models = self._makes.get(normalize_make_model(make))
+        if models is None:
+            raise EntityNotFoundException("Make")
+        if normalize_make_model(model) not in models:
+            raise EntityNotFoundException("Model")
+
+    def search_makes(self, prefix: str, limit: int) -> list[MakeSchema]:
+        return self._makes_search.search(prefix, limit)
+
+    def search_models(
+        self, make_uid: UUID, prefix: str, limit: int
+    ) -> list[ModelSchema]:
+        models = self._models_search.get(make_uid)
+        if models is None:
+            raise EntityNotFoundException("Make")
+        return models.search(prefix, limit)
+
+
+directory_index = MakeModelIndex()
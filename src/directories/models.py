@@ -1,7 +1,7 @@
 from sqlmodel import Field, Column, Relationship, SQLModel
 import sqlalchemy.dialects.postgresql as pg
 from uuid import UUID
-from sqlalchemy import text
+from sqlalchemy import ForeignKey, Index, text
 from ..config import IS_TEST_ENV
 from src.utils.db_types import UUIDString
 
@@ -10,6 +10,11 @@ UUIDColumn = UUIDString if IS_TEST_ENV else pg.UUID
 
 class MakesDirectory(SQLModel, table=True):
     __tablename__ = "makesdir"
+    __table_args__ = (
+        Index("ix_makesdir_lower_make", text("lower(make)")),
+        # Natural keys, the loader upserts on them
+        Index("uq_makesdir_make", "make", unique=True),
+    )
     uid: UUID = Field(
         sa_column=Column(
             UUIDColumn,
@@ -22,7 +27,6 @@ class MakesDirectory(SQLModel, table=True):
 
     models: list["ModelsDirectory"] = Relationship(
         back_populates="make",
-        sa_relationship_kwargs={"lazy": "selectin"},
         cascade_delete=True,
     )
 
@@ -32,6 +36,10 @@ class MakesDirectory(SQLModel, table=True):
 
 class ModelsDirectory(SQLModel, table=True):
     __tablename__ = "modelsdir"
+    __table_args__ = (
+        Index("ix_modelsdir_make_uid_lower_model", "make_uid", text("lower(model)")),
+        Index("uq_modelsdir_make_uid_model", "make_uid", "model", unique=True),
+    )
     uid: UUID = Field(
         sa_column=Column(
             UUIDColumn,
@@ -42,7 +50,9 @@ class ModelsDirectory(SQLModel, table=True):
     )
     model: str = Field(nullable=False)
 
-    make_uid: UUID = Field(foreign_key="makesdir.uid")
+    make_uid: UUID = Field(
+        sa_column=Column(UUIDColumn, ForeignKey("makesdir.uid"), nullable=False)
+    )
     make: "MakesDirectory" = Relationship(back_populates="models")
 
     def __repr__(self):
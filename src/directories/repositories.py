@@ -41,6 +41,14 @@ class DirectoryRepository(BaseRepository):
         )
         return result.one()
 
+    async def count_models_by_makes(self, make_uids: list[UUID]) -> dict[UUID, int]:
+        result = await self.session.exec(
+            select(ModelsDirectory.make_uid, func.count(ModelsDirectory.uid))
+            .where(ModelsDirectory.make_uid.in_(make_uids))
+            .group_by(ModelsDirectory.make_uid)
+        )
+        return dict(result.all())
+
     async def get_single_make(self, requested_make) -> MakesDirectory:
         statement = select(MakesDirectory).where(
             func.lower(MakesDirectory.make) == func.lower(requested_make)
@@ -58,3 +66,15 @@ class DirectoryRepository(BaseRepository):
         )
         model = await self.session.exec(statement)
         return model.one_or_none()
+
+    async def get_make_model_pairs(self) -> list[tuple]:
+        """Whole directory as (make_uid, make, model_uid, model) rows,
+        makes without models included"""
+        statement = select(
+            MakesDirectory.uid,
+            MakesDirectory.make,
+            ModelsDirectory.uid,
+            ModelsDirectory.model,
+        ).outerjoin(ModelsDirectory, ModelsDirectory.make_uid == MakesDirectory.uid)
+        result = await self.session.exec(statement)
+        return result.all()
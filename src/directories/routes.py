@@ -1,20 +1,22 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from src.directories.dependencies import get_dir_service
 from src.directories.models import MakesDirectory, ModelsDirectory
 
 from src.utils.schemas_common import ResponseSchema, PageResponse
 from src.directories.schemas import MakeSchema, ModelSchema
 from src.directories.service import DirectoryService
+from src.utils.timing import TimedRoute
 
-directory_router = APIRouter()
+directory_router = APIRouter(route_class=TimedRoute)
 
 
 @directory_router.get(
     "/makes",
     response_model=ResponseSchema[PageResponse[MakeSchema]]
     | ResponseSchema[MakeSchema],
+    response_model_exclude_unset=True,
 )
 async def get_all_makes(
     page: int = Query(default=1, ge=1),
@@ -22,19 +24,102 @@ async def get_all_makes(
     order_by: str = Query(
         default="asc", pattern="^(asc|desc)$", description="Порядок сортировки"
     ),
+    pagination: str = Query(
+        default="offset", pattern="^(offset|cursor)$", description="Режим пагинации"
+    ),
+    cursor: str | None = Query(default=None, description="next_cursor"),
+    total: str = Query(
+        default="exact",
+        pattern="^(exact|estimate|none)$",
+        description="Подсчёт общего количества",
+    ),
+    with_model_count: bool = Query(
+        default=False, description="Добавить количество моделей марки"
+    ),
     directory_service: DirectoryService = Depends(get_dir_service),
 ):
-    result = await directory_service.get_all_records(
-        MakesDirectory,
+    result = await directory_service.get_makes(
         page=page,
         limit=limit,
-        sort_by="make",
         order=order_by,
-        allowed_sort_fields=["make"],
+        keyset=pagination == "cursor",
+        cursor=cursor,
+        total=total,
+        with_model_count=with_model_count,
     )
     return ResponseSchema(detail="Success", result=result)
 
 
+@directory_router.get("/snapshot")
+async def get_directory_snapshot(
+    request: Request,
+    directory_service: DirectoryService = Depends(get_dir_service),
+):
+    """Весь справочник одним ответом: [[make_uid, make, [[model_uid, model]]]].
+    ETag по содержимому, повторный запрос с If-None-Match получает 304"""
+    snapshot = await directory_service.get_snapshot()
+    use_gzip = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": snapshot.gzip_etag if use_gzip else snapshot.etag,
+        "Cache-Control": "public, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        body = snapshot.gzip_body
+    else:
+        body = snapshot.body
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """gzip is acceptable if listed (or matched by *) with q > 0"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match: * or a list of entity tags, compared weakly"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in [tag.removeprefix("W/") for tag in tags]
+
+
+@directory_router.get(
+    "/makes/search",
+    response_model=ResponseSchema[list[MakeSchema]],
+    response_model_exclude_unset=True,
+)
+async def search_makes(
+    q: str = Query(min_length=1, description="Начало названия марки"),
+    limit: int = Query(default=10, ge=1, le=50),
+    directory_service: DirectoryService = Depends(get_dir_service),
+):
+    result = await directory_service.search_makes(prefix=q, limit=limit)
+    return ResponseSchema(detail="Success", result=result)
+
+
 @directory_router.get(
     "/models",
     response_model=ResponseSchema[PageResponse[ModelSchema]]
@@ -46,6 +131,15 @@ async def get_all_models(
     order_by: str = Query(
         default="asc", pattern="^(asc|desc)$", description="Порядок сортировки"
     ),
+    pagination: str = Query(
+        default="offset", pattern="^(offset|cursor)$", description="Режим пагинации"
+    ),
+    cursor: str | None = Query(default=None, description="next_cursor"),
+    total: str = Query(
+        default="exact",
+        pattern="^(exact|estimate|none)$",
+        description="Подсчёт общего количества",
+    ),
     directory_service: DirectoryService = Depends(get_dir_service),
 ):
     result = await directory_service.get_all_records(
@@ -55,6 +149,9 @@ async def get_all_models(
         sort_by="model",
         order=order_by,
         allowed_sort_fields=["model"],
+        keyset=pagination == "cursor",
+        cursor=cursor,
+        total=total,
     )
     return ResponseSchema(detail="Success", result=result)
 
@@ -82,3 +179,19 @@ async def get_models_by_make(
         allowed_sort_fields="model",
     )
     return ResponseSchema(detail="Success", result=result)
+
+
+@directory_router.get(
+    "/makes/{make_uid}/models/search",
+    response_model=ResponseSchema[list[ModelSchema]],
+)
+async def search_models(
+    make_uid: UUID,
+    q: str = Query(min_length=1, description="Начало названия модели"),
+    limit: int = Query(default=10, ge=1, le=50),
+    directory_service: DirectoryService = Depends(get_dir_service),
+):
+    result = await directory_service.search_models(
+        make_uid=make_uid, prefix=q, limit=limit
+    )
+    return ResponseSchema(detail="Success", result=result)
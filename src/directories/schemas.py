@@ -5,6 +5,7 @@ import uuid
 class MakeSchema(BaseModel):
     uid: uuid.UUID
     make: str
+    model_count: int | None = None  # only with_model_count=true
 
 
 class ModelSchema(BaseModel):
@@ -5,7 +5,9 @@ from uuid import UUID
 from fastapi import HTTPException
 from sqlalchemy import func
 from sqlmodel import select
+from src.directories.index import DirectorySnapshot, directory_index
 from src.directories.models import MakesDirectory, ModelsDirectory
+from src.directories.schemas import MakeSchema, ModelSchema
 from src.directories.repositories import DirectoryRepository
 from src.utils.exceptions import EntityNotFoundException, MakeModelException
 from src.utils.schemas_common import PageResponse
@@ -45,12 +47,55 @@ class DirectoryService(BaseService[DirectoryRepository]):
             content=models,
         )
 
-    async def validate_make_model(self, requested_make: str, requested_model: str):
-        make = await self.repository.get_single_make(requested_make)
-        if not make:
-            raise EntityNotFoundException("Make")
-        model = await self.repository.get_single_model_by_make(
-            requested_model, make.uid
+    async def get_makes(
+        self,
+        page: int,
+        limit: int,
+        order: str = "asc",
+        keyset: bool = False,
+        cursor: Optional[str] = None,
+        total: str = "exact",
+        with_model_count: bool = False,
+    ):
+        result = await self.get_all_records(
+            MakesDirectory,
+            page=page,
+            limit=limit,
+            sort_by="make",
+            order=order,
+            allowed_sort_fields=["make"],
+            keyset=keyset,
+            cursor=cursor,
+            total=total,
         )
-        if not model:
-            raise EntityNotFoundException("Model")
+        if with_model_count:
+            # One grouped query for the page instead of loading the models
+            counts = await self.repository.count_models_by_makes(
+                [make.uid for make in result.content]
+            )
+            result.content = [
+                MakeSchema(
+                    uid=make.uid, make=make.make, model_count=counts.get(make.uid, 0)
+                )
+                for make in result.content
+            ]
+        return result
+
+    async def validate_make_model(self, requested_make: str, requested_model: str):
+        # Checked against the in-memory index, the database is only hit to (re)load it
+        await directory_index.ensure_loaded(self.repository.session)
+        directory_index.validate(requested_make, requested_model)
+
+    async def search_makes(self, prefix: str, limit: int) -> list[MakeSchema]:
+        await directory_index.ensure_loaded(self.repository.session)
+        return directory_index.search_makes(prefix, limit)
+
+    async def search_models(
+        self, make_uid: UUID, prefix: str, limit: int
+    ) -> list[ModelSchema]:
+        await directory_index.ensure_loaded(self.repository.session)
+        return directory_index.search_models(make_uid, prefix, limit)
+
+    async def get_snapshot(self) -> DirectorySnapshot:
+        await directory_index.ensure_loaded(self.repository.session)
+        return directory_index.snapshot
@@ -1,12 +1,27 @@
 from contextlib import asynccontextmanager
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Response
 
 from src.auth.routes import auth_router
 from src.cars.routes import car_router, expenses_router
 from src.users.routes import user_router
 from src.directories.routes import directory_router
+from src.diagnostics.routes import diagnostics_router
+from src.db import core
+from src.db.core import init_engine, dispose_engine
+from src.directories.index import directory_index
+from src.utils.metrics import APP_EXCEPTIONS, mark_process_dead, render_metrics
+from src.utils.profiling import PROFILE_FILE_HEADER, admin_profiler
+from src.utils.middleware import (
+    MEMORY_PEAK_HEADER,
+    MemoryPeakMiddleware,
+    QUERY_COUNT_HEADER,
+    QUERY_TIME_HEADER,
+    PrometheusMiddleware,
+    QueryStatsMiddleware,
+    ServerTimingMiddleware,
+)
 
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -22,7 +37,12 @@ version = "v1"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    init_engine()
+    async with core.session_factory() as session:
+        await directory_index.load(session)
     yield
+    await dispose_engine()
+    mark_process_dead()
 
 
 app = FastAPI(
@@ -39,11 +59,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        QUERY_COUNT_HEADER,
+        QUERY_TIME_HEADER,
+        PROFILE_FILE_HEADER,
+        MEMORY_PEAK_HEADER,
+    ],
 )
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(PrometheusMiddleware)
+app.add_middleware(MemoryPeakMiddleware)
 
 
 @app.exception_handler(VinBusyException)
 def vin_exception_handler(request: Request, exc: VinBusyException):
+    APP_EXCEPTIONS.labels("VinBusyException").inc()
     return JSONResponse(
         status_code=409,
         content={
@@ -55,6 +86,7 @@ def vin_exception_handler(request: Request, exc: VinBusyException):
 
 @app.exception_handler(EntityNotFoundException)
 def entity_not_found(request: Request, exc: EntityNotFoundException):
+    APP_EXCEPTIONS.labels("EntityNotFoundException").inc()
     return JSONResponse(
         status_code=404,
         content={
@@ -66,6 +98,7 @@ def entity_not_found(request: Request, exc: EntityNotFoundException):
 
 @app.exception_handler(MakeModelException)
 def entity_not_found(request: Request, exc: MakeModelException):
+    APP_EXCEPTIONS.labels("MakeModelException").inc()
     return JSONResponse(
         status_code=404,
         content={
@@ -75,12 +108,35 @@ def entity_not_found(request: Request, exc: MakeModelException):
     )
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 app.include_router(auth_router, prefix=f"/api/{version}/auth", tags=["Auth"])
-app.include_router(user_router, prefix=f"/api/{version}/users", tags=["Users"])
-app.include_router(car_router, prefix=f"/api/{version}/cars", tags=["Cars"])
-app.include_router(expenses_router, prefix=f"/api/{version}/cars", tags=["Expenses"])
+# ?profile= is available on the business routes only
+profiled = [Depends(admin_profiler)]
+app.include_router(
+    user_router, prefix=f"/api/{version}/users", tags=["Users"], dependencies=profiled
+)
+app.include_router(
+    car_router, prefix=f"/api/{version}/cars", tags=["Cars"], dependencies=profiled
+)
+app.include_router(
+    expenses_router,
+    prefix=f"/api/{version}/cars",
+    tags=["Expenses"],
+    dependencies=profiled,
+)
+app.include_router(
+    directory_router,
+    prefix=f"/api/{version}/directories",
+    tags=["Directories"],
+    dependencies=profiled,
+)
 app.include_router(
-    directory_router, prefix=f"/api/{version}/directories", tags=["Directories"]
+    diagnostics_router, prefix=f"/api/{version}/diagnostics", tags=["Diagnostics"]
 )
 
 
@@ -2,7 +2,7 @@ import asyncio
 
 from fastapi import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.core import engine
+from src.db.core import init_engine, dispose_engine
 from src.users.repositories import UsersRepository
 from src.users.schemas import UserCreateSchema
 from src.users.service import UserService
@@ -11,7 +11,7 @@ from src.users.models import Users
 
 
 async def create_admin():
-    async with AsyncSession(engine) as session:
+    async with AsyncSession(init_engine()) as session:
         user_repository = UsersRepository(session)
         user_service = UserService(user_repository)
         admin_data = UserCreateSchema(
@@ -26,6 +26,7 @@ async def create_admin():
             print("Admin created successfully")
         except HTTPException as e:
             print(f"Failed: {e}")
+    await dispose_engine()
 
 
 if __name__ == "__main__":
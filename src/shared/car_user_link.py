@@ -1,8 +1,25 @@
-from sqlmodel import SQLModel, Field
+from sqlalchemy import ForeignKey, Index
+from sqlmodel import SQLModel, Field, Column
+import sqlalchemy.dialects.postgresql as pg
 from uuid import UUID
 
+from ..config import IS_TEST_ENV
+from src.utils.db_types import UUIDString
+
+UUIDColumn = UUIDString if IS_TEST_ENV else pg.UUID
+
 
 class CarUserLink(SQLModel, table=True):
     __tablename__ = "car_user_link"
-    user_uid: UUID = Field(foreign_key="users.uid", primary_key=True)
-    car_uid: UUID = Field(foreign_key="cars.uid", primary_key=True)
+    # The primary key leads with user_uid, lookups by car need their own index
+    __table_args__ = (Index("ix_car_user_link_car_uid", "car_uid", "user_uid"),)
+    user_uid: UUID = Field(
+        sa_column=Column(
+            UUIDColumn, ForeignKey("users.uid", ondelete="CASCADE"), primary_key=True
+        )
+    )
+    car_uid: UUID = Field(
+        sa_column=Column(
+            UUIDColumn, ForeignKey("cars.uid", ondelete="CASCADE"), primary_key=True
+        )
+    )
@@ -13,9 +13,10 @@ if TYPE_CHECKING:
     from src.cars.models import Cars, Expenses
 
 from ..config import IS_TEST_ENV
-from src.utils.db_types import UUIDString
+from src.utils.db_types import UUIDString, SQLiteTimestamp
 
 UUIDColumn = UUIDString if IS_TEST_ENV else pg.UUID
+TimestampColumn = SQLiteTimestamp if IS_TEST_ENV else pg.TIMESTAMP
 
 
 class Users(SQLModel, table=True):
@@ -34,21 +35,21 @@ class Users(SQLModel, table=True):
     is_verified: bool = Field(default=False)
     password_hash: str = Field(exclude=True)
     created_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP, default=now(), nullable=False)
+        sa_column=Column(TimestampColumn, default=now(), nullable=False)
     )
     updated_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP, default=None, onupdate=now(), nullable=True)
+        sa_column=Column(TimestampColumn, default=None, onupdate=now(), nullable=True)
     )
 
     cars: list["Cars"] = Relationship(
         back_populates="secondary_owners",
         link_model=CarUserLink,
-        sa_relationship_kwargs={"lazy": "selectin"},
+        passive_deletes=True,
     )
     expenses: list["Expenses"] = Relationship(
         back_populates="user",
-        sa_relationship_kwargs={"lazy": "selectin"},
         cascade_delete=True,
+        passive_deletes=True,
     )
 
     def __repr__(self):
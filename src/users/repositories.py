@@ -1,4 +1,9 @@
-from sqlmodel import select
+from collections import defaultdict
+from uuid import UUID
+
+from sqlmodel import SQLModel, delete, select
+from src.cars.models import Expenses
+from src.cars.repositories import car_totals_update, expense_deltas
 from src.users.models import Users
 from src.utils.base_service_repo import BaseRepository
 
@@ -16,3 +21,26 @@ class UsersRepository(BaseRepository):
             select(Users).where(Users.username == requested_name)
         )
         return user.one_or_none()
+
+    async def delete_by_uid(self, table: SQLModel, uid: UUID) -> bool:
+        if table is Users:
+            # expenses.user_uid would cascade past the car aggregates: delete the
+            # user's expenses first and take them off the cars' totals
+            await self.delete_user_expenses(UUID(str(uid)))
+        return await super().delete_by_uid(table, uid)
+
+    async def delete_user_expenses(self, user_uid: UUID):
+        """Delete every expense of a user and adjust the totals of the cars
+        they were on, in the caller's transaction"""
+        result = await self.session.exec(
+            delete(Expenses)
+            .where(Expenses.user_uid == user_uid)
+            .returning(Expenses.car_uid, Expenses.type, Expenses.exp_summ)
+        )
+        deltas = defaultdict(lambda: [0, 0])
+        for car_uid, exp_type, exp_summ in result.all():
+            purchase, expenses = expense_deltas(exp_type, exp_summ)
+            deltas[car_uid][0] -= purchase
+            deltas[car_uid][1] -= expenses
+        for car_uid, (purchase, expenses) in deltas.items():
+            await self.session.exec(car_totals_update(car_uid, purchase, expenses))
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, status, Query, HTTPException
 from src.utils.schemas_common import ResponseSchema, PageResponse
+from src.utils.timing import TimedRoute
 from .models import Users
 from .schemas import (
     UserCreateSchema,
@@ -11,7 +12,7 @@ from .service import UserService
 from .dependencies import get_user_service
 from ..auth.dependencies import get_current_user, require_admin, require_self_or_admin
 
-user_router = APIRouter()
+user_router = APIRouter(route_class=TimedRoute)
 
 
 @user_router.post(
@@ -37,6 +38,15 @@ async def get_all_users(
     order: str = Query(
         default="desc", pattern="^(asc|desc)$", description="Порядок сортировки"
     ),
+    pagination: str = Query(
+        default="offset", pattern="^(offset|cursor)$", description="Режим пагинации"
+    ),
+    cursor: str | None = Query(default=None, description="next_cursor"),
+    total: str = Query(
+        default="exact",
+        pattern="^(exact|estimate|none)$",
+        description="Подсчёт общего количества",
+    ),
     user_service: UserService = Depends(get_user_service),
     _: UserSchema = Depends(require_admin),
 ):
@@ -46,6 +56,9 @@ async def get_all_users(
         limit=limit,
         sort_by=sort_by,
         order=order,
+        keyset=pagination == "cursor",
+        cursor=cursor,
+        total=total,
         allowed_sort_fields=["created_at", "username", "email"],
     )
     return ResponseSchema(detail="Success", result=result)
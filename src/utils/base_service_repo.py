@@ -4,25 +4,50 @@ from xml.dom.minidom import Entity
 
 from fastapi import HTTPException
 from pydantic import BaseModel
-from sqlmodel import SQLModel, select, update, desc, asc
+from sqlmodel import SQLModel, delete, select, update, desc, asc
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy import func
+from sqlalchemy import func, insert
+from sqlalchemy import select as sa_select
+from sqlalchemy.exc import DBAPIError
 
 from typing import TypeVar, Generic, Optional, Type
 
+from src.db.slow_queries import trace_methods
 from src.utils.exceptions import EntityNotFoundException
+from src.utils.pagination import (
+    ESTIMATE_COUNT_CAP,
+    apply_keyset,
+    apply_sorting,
+    plan_row_estimate,
+    split_keyset_page,
+    with_total_count,
+)
 from src.utils.schemas_common import PageResponse
 
 
+@trace_methods
 class BaseRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def create(self, table: Type[SQLModel], new_entity_dict: dict) -> SQLModel:
-        entity = table(**new_entity_dict)
-        self.session.add(entity)
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Slow query log entries name the repository method
+        trace_methods(cls)
+
+    async def create(
+        self, table: Type[SQLModel], new_entity_dict: dict, options: list = None
+    ) -> SQLModel:
+        # INSERT ... RETURNING: the new row comes back with server defaults filled in.
+        # Like the model constructor, keys that are not columns are ignored
+        columns = table.__table__.columns
+        values = {k: v for k, v in new_entity_dict.items() if k in columns}
+        statement = insert(table).values(**values).returning(table)
+        if options:
+            statement = statement.options(*options)
+        result = await self.session.exec(statement)
+        entity = result.scalars().one()
         await self.session.commit()
-        await self.session.refresh(entity)
         return entity
 
     async def get_by_uid(
@@ -36,54 +61,127 @@ class BaseRepository:
         return result.one_or_none()
 
     async def update_by_uid(
-        self, table: SQLModel, uid: UUID, update_dict: dict
+        self, table: SQLModel, uid: UUID, update_dict: dict, options: list = None
     ) -> Optional[SQLModel]:
-        updatable = await self.get_by_uid(table, uid)
-        if not updatable:
-            return None
-        fixed_uid = UUID(uid)
-        await self.session.exec(
-            update(table).where(table.uid == fixed_uid).values(**update_dict)
+        """UPDATE ... RETURNING, None if there is no such row"""
+        statement = (
+            update(table)
+            .where(table.uid == UUID(str(uid)))
+            .values(**update_dict)
+            .returning(table)
+            .execution_options(populate_existing=True)
         )
+        if options:
+            statement = statement.options(*options)
+        result = await self.session.exec(statement)
+        updated = result.scalars().one_or_none()
         await self.session.commit()
-        await self.session.refresh(updatable)
-        return updatable
-
-    async def delete_by_uid(self, table: SQLModel, uid: UUID) -> SQLModel:
-        deletable = await self.get_by_uid(table, uid)
-        if not deletable:
-            return False
-        await self.session.delete(deletable)
+        return updated
+
+    async def delete_by_uid(self, table: SQLModel, uid: UUID) -> bool:
+        """DELETE ... RETURNING, dependent rows go with ON DELETE CASCADE"""
+        result = await self.session.exec(
+            delete(table).where(table.uid == UUID(str(uid))).returning(table.uid)
+        )
+        deleted = result.one_or_none()
         await self.session.commit()
-        return True
+        return deleted is not None
 
-    async def count_all_records(self, table: SQLModel):
-        result = await self.session.exec(select(func.count(table.uid)))
+    async def count_records(self, statement, total: str = "exact") -> Optional[int]:
+        """Count rows of a filtered select: exact, estimated or not at all"""
+        if total == "none":
+            return None
+        statement = statement.order_by(None).limit(None).offset(None)
+        if total == "estimate":
+            estimate = await self.estimate_records(statement)
+            if estimate is not None:
+                return estimate
+            statement = statement.limit(ESTIMATE_COUNT_CAP)
+        result = await self.session.exec(
+            select(func.count()).select_from(statement.subquery())
+        )
         return result.one()
 
-    async def get_all_records(
+    async def estimate_records(self, statement) -> Optional[int]:
+        """Planner row estimate (PostgreSQL only), None if unavailable"""
+        connection = await self.session.connection()
+        if connection.dialect.name != "postgresql":
+            return None
+        compiled = statement.compile(dialect=connection.dialect)
+        params = compiled.construct_params()
+        if compiled.positiontup:
+            params = tuple(params[name] for name in compiled.positiontup)
+        try:
+            async with connection.begin_nested():
+                result = await connection.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {compiled}", params
+                )
+                plan = result.scalar()
+        except DBAPIError:
+            return None
+        return plan_row_estimate(plan)
+
+    async def paginate(
         self,
+        statement,
         table: SQLModel,
         offset: int,
         limit: int,
         sort_by: Optional[str] = None,
         order: str = "desc",
-    ) -> list[SQLModel]:
-        statement = select(table).offset(offset).limit(limit)
-
-        if sort_by:
-            sort_column = getattr(table, sort_by, None)
-            if sort_column is None:
-                raise HTTPException(
-                    status_code=422, detail=f"Invalid sort field: {sort_by}"
-                )
-            if order == "desc":
-                statement = statement.order_by(desc(sort_column))
-            else:
-                statement = statement.order_by(asc(sort_column))
+        keyset: bool = False,
+        cursor: Optional[str] = None,
+        total: str = "exact",
+    ) -> tuple[list, Optional[int]]:
+        """Fetch one page of a filtered select and its total count.
+        statement is a Core select of one entity (sqlalchemy.select).
+        In offset mode an exact total comes from a window count in the same query"""
+        if keyset:
+            page_statement = apply_keyset(
+                statement, table, limit, sort_by, order, cursor
+            )
+            result = await self.session.exec(page_statement)
+            records = result.scalars().all()
+            return records, await self.count_records(statement, total)
 
-        result = await self.session.exec(statement)
-        return result.all()
+        page_statement = apply_sorting(statement, table, sort_by, order)
+        page_statement = page_statement.offset(offset).limit(limit)
+        if total != "exact":
+            result = await self.session.exec(page_statement)
+            records = result.scalars().all()
+            return records, await self.count_records(statement, total)
+
+        result = await self.session.exec(with_total_count(page_statement))
+        rows = result.all()
+        if rows:
+            return [row[0] for row in rows], rows[0][1]
+        # Page past the end: the window count has no row to ride on
+        if offset:
+            return [], await self.count_records(statement, total)
+        return [], 0
+
+    async def get_all_records(
+        self,
+        table: SQLModel,
+        offset: int,
+        limit: int,
+        sort_by: Optional[str] = None,
+        order: str = "desc",
+        keyset: bool = False,
+        cursor: Optional[str] = None,
+        total: str = "exact",
+    ) -> tuple[list[SQLModel], Optional[int]]:
+        return await self.paginate(
+            sa_select(table),
+            table,
+            offset,
+            limit,
+            sort_by,
+            order,
+            keyset=keyset,
+            cursor=cursor,
+            total=total,
+        )
 
 
 R = TypeVar("R", bound=BaseRepository)
@@ -103,12 +201,14 @@ class BaseService(Generic[R]):
             raise EntityNotFoundException(f"{table.__name__}-uid")
 
     async def update_by_uid(
-        self, table: SQLModel, uid: UUID, update_dict: BaseModel
+        self, table: SQLModel, uid: UUID, update_dict: BaseModel, options: list = None
     ) -> SQLModel:
         update_dict = update_dict.model_dump(exclude_unset=True)
         if not update_dict:
             raise HTTPException(status_code=422, detail="Update body cannot be empty")
-        updated_entity = await self.repository.update_by_uid(table, uid, update_dict)
+        updated_entity = await self.repository.update_by_uid(
+            table, uid, update_dict, options
+        )
         if updated_entity:
             return updated_entity
         else:
@@ -120,6 +220,28 @@ class BaseService(Generic[R]):
             raise EntityNotFoundException(f"{table.__name__}-uid")
         return True
 
+    @staticmethod
+    def build_page(
+        records: list,
+        total_records: Optional[int],
+        page: int,
+        limit: int,
+        next_cursor: Optional[str] = None,
+        total: str = "exact",
+    ) -> PageResponse:
+        total_pages = (
+            math.ceil(total_records / limit) if total_records is not None else None
+        )
+        return PageResponse(
+            page_number=page,
+            page_size=limit,
+            total_pages=total_pages,
+            total_records=total_records,
+            total_type=total,
+            content=records,
+            next_cursor=next_cursor,
+        )
+
     async def get_all_records(
         self,
         table: SQLModel,
@@ -128,25 +250,30 @@ class BaseService(Generic[R]):
         sort_by: str = "created_at",
         order: str = "desc",
         allowed_sort_fields: Optional[list[str]] = None,
+        keyset: bool = False,
+        cursor: Optional[str] = None,
+        total: str = "exact",
     ):
         offset_page = (page - 1) * limit
+        keyset = keyset or cursor is not None
 
         if allowed_sort_fields and sort_by not in allowed_sort_fields:
             raise HTTPException(
                 status_code=422, detail=f"Sorting by '{sort_by}' is not allowed."
             )
 
-        records = await self.repository.get_all_records(
-            table, offset_page, limit, sort_by, order
+        records, total_records = await self.repository.get_all_records(
+            table,
+            offset_page,
+            limit,
+            sort_by,
+            order,
+            keyset=keyset,
+            cursor=cursor,
+            total=total,
         )
+        next_cursor = None
+        if keyset:
+            records, next_cursor = split_keyset_page(records, limit, sort_by, order)
 
-        total_records = await self.repository.count_all_records(table)
-        total_pages = math.ceil(total_records / limit)
-
-        return PageResponse(
-            page_number=page,
-            page_size=limit,
-            total_pages=total_pages,
-            total_records=total_records,
-            content=records,
-        )
+        return self.build_page(records, total_records, page, limit, next_cursor, total)
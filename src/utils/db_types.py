@@ -1,3 +1,4 @@
+from sqlalchemy.dialects.sqlite import DATETIME
 from sqlalchemy.types import TypeDecorator, CHAR
 from uuid import UUID
 
@@ -17,3 +18,11 @@ class UUIDString(TypeDecorator):
         if value is None:
             return None
         return UUID(value)
+
+
+# SQLite's CURRENT_TIMESTAMP has no fractional seconds, so bound datetimes
+# have to be rendered the same way to compare equal (keyset pagination)
+SQLiteTimestamp = DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d "
+    "%(hour)02d:%(minute)02d:%(second)02d"
+)
@@ -0,0 +1,111 @@
+"""Prometheus metrics.
+
+With several workers set PROMETHEUS_MULTIPROC_DIR to an empty directory
+shared by them (cleared before start): every process writes its values
+there and /metrics aggregates them, whichever worker answers the scrape.
+"""
+
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being processed",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+REQUEST_MEMORY_PEAK = Histogram(
+    "http_request_memory_peak_bytes",
+    "Peak traced memory of a request, only while tracemalloc runs",
+    ["method", "route"],
+    buckets=(2**16, 2**18, 2**20, 2**22, 2**24, 2**26, 2**28),
+)
+APP_EXCEPTIONS = Counter(
+    "app_exceptions_total",
+    "Domain exceptions turned into error responses",
+    ["exception"],
+)
+
+POOL_SIZE = Gauge("db_pool_size", "Configured pool size", multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections checked out of the pool",
+    multiprocess_mode="livesum",
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Connections opened over pool_size",
+    multiprocess_mode="livesum",
+)
+POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connection checkouts")
+POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total", "Checkouts that gave up waiting for a connection"
+)
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a connection from the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool reporting checkouts, waits and saturation"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        POOL_SIZE.set(self.size())
+
+    def _update_gauges(self):
+        POOL_CHECKED_OUT.set(self.checkedout())
+        POOL_OVERFLOW.set(max(self.overflow(), 0))
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - started)
+        POOL_CHECKOUTS.inc()
+        self._update_gauges()
+        return record
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._update_gauges()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drop this worker's live gauges from the shared directory"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
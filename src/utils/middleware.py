@@ -0,0 +1,170 @@
+import logging
+import time
+import tracemalloc
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import Config
+from src.db.core import track_queries
+from src.utils.metrics import (
+    REQUEST_LATENCY,
+    REQUEST_MEMORY_PEAK,
+    REQUESTS_IN_PROGRESS,
+)
+from src.utils.timing import track_timings
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+QUERY_TIME_HEADER = "X-DB-Query-Time"
+SERVER_TIMING_HEADER = "Server-Timing"
+MEMORY_PEAK_HEADER = "X-Memory-Peak"
+
+
+class QueryStatsMiddleware:
+    """SQL statements and DB time of a request: response headers and a log line.
+    Statements run after the response has started (session teardown) are only logged"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = None
+        with track_queries() as stats:
+
+            async def send_with_stats(message: Message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    headers = MutableHeaders(scope=message)
+                    headers[QUERY_COUNT_HEADER] = str(stats.count)
+                    headers[QUERY_TIME_HEADER] = f"{stats.duration * 1000:.2f}"
+                await send(message)
+
+            await self.app(scope, receive, send_with_stats)
+
+        level = (
+            logging.WARNING
+            if stats.count > Config.DB_QUERY_WARN_COUNT
+            else logging.INFO
+        )
+        logger.log(
+            level,
+            f"{scope['method']} {scope['path']} {status_code}: "
+            f"{stats.count} queries, {stats.duration * 1000:.2f} ms",
+        )
+
+
+class ServerTimingMiddleware:
+    """Where the time of a request went: JWT decoding, user lookup, SQL,
+    stats, endpoint and serialization, as Server-Timing and a log line"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        metrics = {}
+        status_code = None
+        with track_timings() as timings, track_queries() as stats:
+
+            async def send_with_timing(message: Message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    metrics.update(timings.durations)
+                    metrics["db"] = stats.duration
+                    metrics["total"] = time.perf_counter() - started
+                    header = ", ".join(
+                        f"{name};dur={seconds * 1000:.2f}"
+                        + (f';desc="{stats.count} queries"' if name == "db" else "")
+                        for name, seconds in metrics.items()
+                    )
+                    MutableHeaders(scope=message)[SERVER_TIMING_HEADER] = header
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+        logger.info(
+            f"timing method={scope['method']} path={scope['path']} "
+            f"status={status_code} queries={stats.count} "
+            + " ".join(
+                f"{name}_ms={seconds * 1000:.2f}" for name, seconds in metrics.items()
+            )
+        )
+
+
+class PrometheusMiddleware:
+    """Latency histogram by route template and in-flight requests"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            # Path templates only, raw paths would explode the label set
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                method, route.path if route else "unmatched", str(status_code)
+            ).observe(time.perf_counter() - started)
+
+
+class MemoryPeakMiddleware:
+    """While tracemalloc runs: bytes allocated at the peak of a request, above
+    what was traced when it started. Concurrent requests share the peak,
+    so numbers are exact only on a worker serving one request at a time"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not tracemalloc.is_tracing():
+            await self.app(scope, receive, send)
+            return
+
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        peak = 0
+
+        async def send_with_peak(message: Message):
+            nonlocal peak
+            if message["type"] == "http.response.start" and tracemalloc.is_tracing():
+                peak = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+                MutableHeaders(scope=message)[MEMORY_PEAK_HEADER] = str(peak)
+            await send(message)
+
+        await self.app(scope, receive, send_with_peak)
+        route = scope.get("route")
+        if route is not None and peak:
+            REQUEST_MEMORY_PEAK.labels(scope["method"], route.path).observe(peak)
+            logger.info(
+                f"memory method={scope['method']} path={scope['path']} peak={peak}"
+            )
@@ -0,0 +1,143 @@
+import base64
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import and_, asc, desc, func, or_, tuple_
+from sqlalchemy import types as sqltypes
+from sqlmodel import SQLModel
+from sqlmodel.sql.expression import SelectOfScalar
+
+
+# "estimate" totals never count more rows than this
+ESTIMATE_COUNT_CAP = 10000
+
+
+def _get_sort_column(table: SQLModel, sort_by: str):
+    sort_column = getattr(table, sort_by, None)
+    if sort_column is None:
+        raise HTTPException(status_code=422, detail=f"Invalid sort field: {sort_by}")
+    return sort_column
+
+
+def apply_sorting(
+    statement, table: SQLModel, sort_by: Optional[str] = None, order: str = "desc"
+):
+    if not sort_by:
+        return statement
+    sort_column = _get_sort_column(table, sort_by)
+    direction = desc if order == "desc" else asc
+    return statement.order_by(direction(sort_column))
+
+
+def with_total_count(statement):
+    """Add count(*) OVER () to a page query: rows and total in one round trip.
+    Takes a Core select (sqlalchemy.select), sqlmodel's select() of one entity
+    would hand back scalars and drop the count column"""
+    if isinstance(statement, SelectOfScalar):
+        raise TypeError("with_total_count() needs a sqlalchemy.select() statement")
+    return statement.add_columns(func.count().over().label("total_count"))
+
+
+def plan_row_estimate(plan) -> int:
+    """Top-level row estimate of EXPLAIN (FORMAT JSON) output,
+    as text (asyncpg) or already decoded (psycopg)"""
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+"""Keyset (cursor) pagination"""
+
+
+def _dump_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def _load_value(sort_column, value):
+    if value is None:
+        return None
+    if isinstance(sort_column.type, sqltypes.DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(sort_column.type, sqltypes.Date):
+        return date.fromisoformat(value)
+    return value
+
+
+def encode_cursor(entity: SQLModel, sort_by: str, order: str) -> str:
+    payload = {
+        "s": sort_by,
+        "o": order,
+        "v": _dump_value(getattr(entity, sort_by)),
+        "u": str(entity.uid),
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, order: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        payload["u"] = UUID(payload["u"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    if payload.get("s") != sort_by or payload.get("o") != order:
+        raise HTTPException(
+            status_code=422, detail="Cursor does not match sort_by/order"
+        )
+    return payload
+
+
+def apply_keyset(
+    statement,
+    table: SQLModel,
+    limit: int,
+    sort_by: str,
+    order: str = "desc",
+    cursor: Optional[str] = None,
+):
+    """Seek on (sort_column, uid) instead of OFFSET.
+    NULL sort values always go last, so the order is the same on every backend.
+    One extra row is fetched to know if there is a next page."""
+    sort_column = _get_sort_column(table, sort_by)
+    nullable = getattr(sort_column.expression, "nullable", True)
+    is_desc = order == "desc"
+
+    if cursor:
+        payload = decode_cursor(cursor, sort_by, order)
+        value = _load_value(sort_column, payload["v"])
+        last_uid = payload["u"]
+        uid_after = table.uid < last_uid if is_desc else table.uid > last_uid
+        if value is None:
+            statement = statement.where(and_(sort_column.is_(None), uid_after))
+        else:
+            row = tuple_(sort_column, table.uid)
+            after = row < (value, last_uid) if is_desc else row > (value, last_uid)
+            if nullable:
+                after = or_(after, sort_column.is_(None))
+            statement = statement.where(after)
+
+    direction = desc if is_desc else asc
+    return statement.order_by(
+        direction(sort_column).nulls_last(), direction(table.uid)
+    ).limit(limit + 1)
+
+
+def split_keyset_page(
+    records: list, limit: int, sort_by: str, order: str
+) -> tuple[list, Optional[str]]:
+    records = list(records)
+    if len(records) <= limit:
+        return records, None
+    records = records[:limit]
+    return records, encode_cursor(records[-1], sort_by, order)
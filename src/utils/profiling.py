@@ -0,0 +1,162 @@
+"""Opt-in profiling of a single request for admins.
+
+    GET /api/v1/cars/<uid>?profile=sampling   (or the X-Profile header)
+
+sampling - stack samples of the event loop thread in the collapsed format
+           (flamegraph.pl, speedscope), cprofile - deterministic cProfile dump
+           (snakeviz, pstats). The file lands in PROFILE_DIR and its name is
+           returned in X-Profile-File. Both see everything the event loop runs
+           meanwhile, so profile on a quiet worker.
+
+Mounted on the business routers only. The flag is ignored unless the caller
+is an admin; only one cProfile run at a time, a second one gets 409.
+"""
+
+import cProfile
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from uuid import uuid4
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.dependencies import get_current_user, oauth2_scheme, require_admin
+from src.config import BASE_DIR, Config
+from src.db.core import get_session
+from src.users.repositories import UsersRepository
+from src.users.service import UserService
+from src.utils.exceptions import EntityNotFoundException
+
+PROFILE_PARAM = "profile"
+PROFILE_HEADER = "X-Profile"
+PROFILE_FILE_HEADER = "X-Profile-File"
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread from a background thread"""
+
+    suffix = "collapsed"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_qualname} ({code.co_filename}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: Path):
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in self.stacks.items()),
+            encoding="utf-8",
+        )
+
+
+class DeterministicProfiler:
+    suffix = "prof"
+    # Only one cProfile profiler can be active in the interpreter
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        if not self._lock.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Another cprofile run is in progress",
+            )
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Some other profiler (not ours) is already enabled
+            self._lock.release()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Another profiler is active",
+            )
+
+    def stop(self):
+        self.profile.disable()
+        self._lock.release()
+
+    def dump(self, path: Path):
+        self.profile.dump_stats(path)
+
+
+def make_profiler(mode: str):
+    if mode == "sampling":
+        return SamplingProfiler(Config.PROFILE_SAMPLING_INTERVAL)
+    if mode == "cprofile":
+        return DeterministicProfiler()
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Profile mode must be 'sampling' or 'cprofile'",
+    )
+
+
+def profile_dir() -> Path:
+    path = Path(Config.PROFILE_DIR)
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+async def admin_profiler(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+):
+    """Router dependency: profiles the rest of the request (dependencies,
+    endpoint, serialization) when an admin asks for it"""
+    mode = request.query_params.get(PROFILE_PARAM) or request.headers.get(
+        PROFILE_HEADER
+    )
+    if not mode:
+        yield
+        return
+
+    # Same checks as the admin routes, on the request's own session.
+    # Anyone else just gets the plain request, the route does its own auth
+    try:
+        token = await oauth2_scheme(request)
+        user_service = UserService(UsersRepository(session))
+        await require_admin(await get_current_user(token, user_service))
+    except (HTTPException, EntityNotFoundException):
+        yield
+        return
+
+    profiler = make_profiler(mode)
+    path = profile_dir() / (
+        f"{datetime.now():%Y%m%d-%H%M%S}-{request.method}"
+        f"-{request.url.path.strip('/').replace('/', '_')}"
+        f"-{uuid4().hex[:8]}.{profiler.suffix}"
+    )
+    profiler.start()
+    response.headers[PROFILE_FILE_HEADER] = path.name
+    try:
+        yield
+    finally:
+        # Профиль пишется и при ошибке запроса
+        profiler.stop()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump(path)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from typing import TypeVar, Generic
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 
 """Pagination"""
@@ -15,6 +15,8 @@ class ResponseSchema(BaseModel, Generic[T]):
 class PageResponse(BaseModel, Generic[T]):
     page_number: int
     page_size: int
-    total_pages: int
-    total_records: int
+    total_pages: Optional[int] = None
+    total_records: Optional[int] = None
+    total_type: Literal["exact", "estimate", "none"] = "exact"
     content: List[T]
+    next_cursor: Optional[str] = None
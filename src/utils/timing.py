@@ -0,0 +1,102 @@
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from fastapi.routing import APIRoute
+
+
+@dataclass
+class RequestTimings:
+    durations: dict[str, float] = field(default_factory=dict)  # seconds
+    endpoint_finished: Optional[float] = None
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+@contextmanager
+def track_timings() -> Iterator[RequestTimings]:
+    timings = RequestTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def timed(name: str):
+    """Add the block's duration to the current request; also a decorator"""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def _mark_endpoint_finished():
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.endpoint_finished = time.perf_counter()
+
+
+class TimedRoute(APIRoute):
+    """Splits a route into endpoint time and response serialization"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        # include_router() builds the route again from the wrapped endpoint
+        if getattr(endpoint, "timed_endpoint", False):
+            super().__init__(path, endpoint, **kwargs)
+            return
+
+        # Keep the endpoint's kind: FastAPI runs plain def endpoints in the
+        # threadpool, which sees the request's timings through the copied context
+        if inspect.iscoroutinefunction(endpoint):
+
+            @functools.wraps(endpoint)
+            async def timed_endpoint(*args, **kw):
+                try:
+                    with timed("endpoint"):
+                        return await endpoint(*args, **kw)
+                finally:
+                    _mark_endpoint_finished()
+
+        else:
+
+            @functools.wraps(endpoint)
+            def timed_endpoint(*args, **kw):
+                try:
+                    with timed("endpoint"):
+                        return endpoint(*args, **kw)
+                finally:
+                    _mark_endpoint_finished()
+
+        timed_endpoint.timed_endpoint = True
+        super().__init__(path, timed_endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            timings = _current_timings.get()
+            if timings is not None and timings.endpoint_finished is not None:
+                timings.add(
+                    "serialize", time.perf_counter() - timings.endpoint_finished
+                )
+            return response
+
+        return timed_handler
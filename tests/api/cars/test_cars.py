@@ -1,7 +1,16 @@
+import asyncio
+from uuid import uuid4
+
 import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import func, select
+
+from src.cars.models import Cars, Expenses
+from src.cars.repositories import CarsRepository, violates_active_vin
+from src.shared.car_user_link import CarUserLink
 from src.users.schemas import UserRole
 from tests.api.cars.cars_helpers import create_mock_car, create_five_mock_cars
-from tests.conftest import mock_user_factory, override_current_user
+from tests.conftest import TestSession, mock_user_factory, override_current_user
 
 
 @pytest.fixture()
@@ -334,6 +343,82 @@ async def test_cars_create_car_same_vin_sold(
     assert response.status_code == 201
 
 
+@pytest.mark.asyncio
+async def test_cars_create_car_same_vin_concurrent(
+    client,
+    get_access_token,
+    mock_car_single,
+):
+    token = await get_access_token()
+    responses = await asyncio.gather(
+        *[
+            client.post(
+                "api/v1/cars/",
+                json=mock_car_single,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            for _ in range(3)
+        ]
+    )
+    assert sorted(response.status_code for response in responses) == [201, 409, 409]
+
+
+@pytest.mark.asyncio
+async def test_cars_update_car_status_vin_conflict(
+    client,
+    get_access_token,
+    mock_car_single,
+):
+    token = await get_access_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = await client.post(
+        "api/v1/cars/", json={**mock_car_single, "status": "SOLD"}, headers=headers
+    )
+    assert response.status_code == 201
+    sold_uid = response.json()["result"]["uid"]
+    response = await client.post("api/v1/cars/", json=mock_car_single, headers=headers)
+    assert response.status_code == 201
+
+    response = await client.patch(
+        f"api/v1/cars/{sold_uid}", json={"status": "FRESH"}, headers=headers
+    )
+    assert response.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_cars_update_car_other_integrity_error_not_vin_busy(
+    client, get_access_token, mock_car_single
+):
+    token = await get_access_token()
+    car = await create_mock_car(client, token, mock_car_single)
+    async with TestSession() as session:
+        with pytest.raises(IntegrityError):
+            await CarsRepository(session).update_by_uid(
+                Cars, car["uid"], {"primary_owner_uid": uuid4()}
+            )
+
+
+class PostgresError(Exception):
+    def __init__(self, constraint_name):
+        self.constraint_name = constraint_name
+
+
+@pytest.mark.parametrize(
+    "constraint_name, expected",
+    [("uq_cars_vin_active", True), ("cars_primary_owner_uid_fkey", False)],
+)
+def test_cars_violates_active_vin_postgres(constraint_name, expected):
+    # asyncpg: ошибка сервера с именем ограничения - причина ошибки DBAPI
+    try:
+        try:
+            raise PostgresError(constraint_name)
+        except PostgresError as cause:
+            raise Exception("duplicate key value") from cause
+    except Exception as orig:
+        error = IntegrityError("UPDATE cars ...", {}, orig)
+    assert violates_active_vin(error) is expected
+
+
 @pytest.mark.parametrize(
     "query, expected_status, expected_length",
     [
@@ -569,6 +654,39 @@ async def test_cars_delete_car_success(client, get_access_token, mock_car_single
     assert response.status_code == 204
 
 
+@pytest.mark.asyncio
+async def test_cars_delete_car_cascades_to_expenses_and_owners(
+    client, get_access_token, create_user, mock_car_single
+):
+    token = await get_access_token("owner_a@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    user_b = await create_user("owner_b", "owner_b@example.com")
+    car = await create_mock_car(client, token, mock_car_single)
+    response = await client.post(
+        f"/api/v1/cars/{car['uid']}/owners",
+        params={"new_owner_uid": user_b["uid"]},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    response = await client.post(
+        f"/api/v1/cars/{car['uid']}",
+        json={"name": "Paint", "exp_summ": 5000},
+        headers=headers,
+    )
+    assert response.status_code == 201
+
+    response = await client.delete(f"/api/v1/cars/{car['uid']}", headers=headers)
+    assert response.status_code == 204
+
+    # Дочерние строки удаляет ON DELETE CASCADE в самой БД
+    async with TestSession() as session:
+        for table in (Expenses, CarUserLink):
+            result = await session.exec(
+                select(func.count()).where(table.car_uid == car["uid"])
+            )
+            assert result.one() == 0, table.__tablename__
+
+
 @pytest.mark.asyncio
 async def test_cars_delete_car_unauthorized(client, mock_car_single, get_access_token):
     token = await get_access_token()
@@ -649,3 +767,270 @@ async def test_cars_get_all_cars_filtered_access(
         assert response.status_code == 200
         assert len(response.json()["result"]["content"]) == 2
         assert response.json()["result"]["content"][1]["year"] == 2017
+
+
+@pytest.mark.asyncio
+async def test_cars_get_all_cars_filtered_with_expenses(
+    client, mock_car_single, mock_user_factory, override_current_user
+):
+    admin = mock_user_factory(role=UserRole.ADMIN)
+    override_current_user(admin)
+    response = await client.post("/api/v1/cars/", json=mock_car_single)
+    assert response.status_code == 201
+    car_uid = response.json()["result"]["uid"]
+    response = await client.post(
+        f"/api/v1/cars/{car_uid}", json={"name": "Mock Expense", "exp_summ": 5000}
+    )
+    assert response.status_code == 201
+
+    response = await client.post("/api/v1/cars/all", json={"page": 1, "limit": 10})
+    assert response.status_code == 200
+    car = response.json()["result"]["content"][0]
+    assert car["uid"] == car_uid
+    assert car["secondary_owners"] == []
+    # Expenses are not part of car responses, not an empty list either
+    assert "expenses" not in car
+    response = await client.get(f"/api/v1/cars/{car_uid}")
+    assert "expenses" not in response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_cars_queries_do_not_grow_with_cars_and_expenses(
+    client, mock_cars, mock_user_factory, override_current_user, query_budget
+):
+    admin = mock_user_factory(role=UserRole.ADMIN)
+    override_current_user(admin)
+    for car_data in mock_cars:
+        response = await client.post("/api/v1/cars/", json=car_data)
+        assert response.status_code == 201
+        car_uid = response.json()["result"]["uid"]
+        for exp_summ in (1000, 2000, 3000):
+            response = await client.post(
+                f"/api/v1/cars/{car_uid}", json={"name": "Parts", "exp_summ": exp_summ}
+            )
+            assert response.status_code == 201
+
+    # Page query with the window count + secondary owners
+    with query_budget(2):
+        response = await client.post("/api/v1/cars/all", json={"limit": 10})
+    assert response.status_code == 200
+    assert len(response.json()["result"]["content"]) == len(mock_cars)
+
+    # Access check + UPDATE ... RETURNING + secondary owners
+    with query_budget(3):
+        response = await client.patch(
+            f"/api/v1/cars/{car_uid}", json={"notes": "Battery replaced"}
+        )
+    assert response.status_code == 200
+    assert "expenses" not in response.json()["result"]
+
+
+@pytest.mark.parametrize(
+    "sort_by, order",
+    [
+        ("created_at", "desc"),
+        ("year", "asc"),
+        ("make", "desc"),
+    ],
+)
+async def test_cars_get_my_cars_cursor_pagination(
+    client, get_access_token, mock_cars, sort_by, order
+):
+    token = await get_access_token()
+    await create_five_mock_cars(client, token, mock_cars)
+    seen = []
+    url = f"/api/v1/cars/my_cars?limit=2&sort_by={sort_by}&order={order}&pagination=cursor"
+    for _ in range(5):
+        if not url:
+            break
+        response = await client.get(url, headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        result = response.json()["result"]
+        seen.extend(car["uid"] for car in result["content"])
+        next_cursor = result.get("next_cursor")
+        url = (
+            f"/api/v1/cars/my_cars?limit=2&sort_by={sort_by}&order={order}"
+            f"&cursor={next_cursor}"
+            if next_cursor
+            else None
+        )
+
+    response = await client.get(
+        f"/api/v1/cars/my_cars?limit=10&sort_by={sort_by}&order={order}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    expected = [car["uid"] for car in response.json()["result"]["content"]]
+    assert len(seen) == 5
+    assert sorted(seen) == sorted(expected)
+    if sort_by != "created_at":
+        assert seen == expected
+
+
+@pytest.mark.asyncio
+async def test_cars_get_my_cars_invalid_cursor(client, get_access_token):
+    token = await get_access_token()
+    response = await client.get(
+        "/api/v1/cars/my_cars?cursor=not-a-cursor",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("query", ["", "?total=estimate", "?pagination=cursor"])
+async def test_cars_get_my_cars_with_co_owners_listed_once(
+    client, get_access_token, create_user, mock_cars, query
+):
+    token = await get_access_token("owner_a@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    cars = await create_five_mock_cars(client, token, mock_cars[:2])
+    for username in ("owner_b", "owner_c"):
+        user = await create_user(username, f"{username}@example.com")
+        response = await client.post(
+            f"/api/v1/cars/{cars[0]['uid']}/owners",
+            params={"new_owner_uid": user["uid"]},
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+    response = await client.get(f"/api/v1/cars/my_cars{query}", headers=headers)
+    assert response.status_code == 200
+    result = response.json()["result"]
+    assert sorted(car["uid"] for car in result["content"]) == sorted(
+        car["uid"] for car in cars
+    )
+    if "cursor" not in query:
+        assert result["total_records"] == 2
+
+
+@pytest.mark.parametrize(
+    "query, expected_total, expected_length",
+    [
+        ("?limit=2", 5, 2),
+        ("?limit=2&total=exact&page=3", 5, 1),
+        ("?limit=2&total=exact&page=4", 5, 0),
+        ("?limit=2&total=estimate", 5, 2),
+        ("?limit=2&total=none", None, 2),
+    ],
+)
+async def test_cars_get_my_cars_total_modes(
+    client, get_access_token, mock_cars, query, expected_total, expected_length
+):
+    token = await get_access_token()
+    await create_five_mock_cars(client, token, mock_cars)
+    response = await client.get(
+        f"/api/v1/cars/my_cars{query}", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    result = response.json()["result"]
+    assert len(result["content"]) == expected_length
+    assert result.get("total_records") == expected_total
+    if expected_total is None:
+        assert result["total_type"] == "none"
+        assert "total_pages" not in result
+    else:
+        assert result["total_pages"] == 3
+
+
+@pytest.mark.asyncio
+async def test_cars_get_all_cars_filtered_by_profit(
+    client, mock_cars, mock_user_factory, override_current_user
+):
+    admin = mock_user_factory(role=UserRole.ADMIN)
+    override_current_user(admin)
+    for price_sold, car in zip([100000, 300000, 200000], mock_cars):
+        response = await client.post("/api/v1/cars/", json=car)
+        assert response.status_code == 201
+        car_uid = response.json()["result"]["uid"]
+        response = await client.patch(
+            f"/api/v1/cars/{car_uid}", json={"price_sold": price_sold}
+        )
+        assert response.status_code == 200
+
+    response = await client.post(
+        "/api/v1/cars/all",
+        json={
+            "profit": {"value_from": 150000},
+            "sort_by": "profit",
+            "order_desc": "asc",
+        },
+    )
+    assert response.status_code == 200
+    result = response.json()["result"]
+    assert result["total_records"] == 2
+    assert [car["profit"] for car in result["content"]] == [200000, 300000]
+
+
+@pytest.mark.asyncio
+async def test_cars_get_car_owners_stats(client, get_access_token, mock_car_single):
+    token_a = await get_access_token("owner_a@example.com")
+    token_b = await get_access_token("owner_b@example.com")
+    headers_a = {"Authorization": f"Bearer {token_a}"}
+    headers_b = {"Authorization": f"Bearer {token_b}"}
+    user_b = (await client.get("/api/v1/auth/me", headers=headers_b)).json()
+
+    response = await client.post(
+        "/api/v1/cars/", json=mock_car_single, headers=headers_a
+    )
+    assert response.status_code == 201
+    car_uid = response.json()["result"]["uid"]
+    response = await client.post(
+        f"/api/v1/cars/{car_uid}/owners",
+        params={"new_owner_uid": user_b["uid"]},
+        headers=headers_a,
+    )
+    assert response.status_code == 200
+
+    for headers, exp in [
+        (headers_a, {"type": "PURCHASE", "name": "Purchase", "exp_summ": 100000}),
+        (headers_a, {"name": "Paint", "exp_summ": 5000}),
+        (headers_b, {"name": "Wheels", "exp_summ": 20000}),
+    ]:
+        response = await client.post(
+            f"/api/v1/cars/{car_uid}", json=exp, headers=headers
+        )
+        assert response.status_code == 201
+    response = await client.patch(
+        f"/api/v1/cars/{car_uid}", json={"price_sold": 200000}, headers=headers_a
+    )
+    assert response.status_code == 200
+
+    response = await client.get(f"/api/v1/cars/{car_uid}", headers=headers_b)
+    assert response.status_code == 200
+    stats = response.json()["result"]["stats"]
+    assert stats["profit"] == 75000
+    assert stats["owners_count"] == 2
+    assert stats["profit_per_owner"] == 37500
+    owners = {owner["email"]: owner for owner in stats["owners_stats"]}
+    assert owners["owner_a@example.com"]["username"] == "owner_a"
+    assert owners["owner_a@example.com"]["owner_total_expenses"] == 105000
+    assert owners["owner_a@example.com"]["net_payout"] == 142500
+    assert owners["owner_b@example.com"]["owner_total_expenses"] == 20000
+    assert owners["owner_b@example.com"]["net_payout"] == 57500
+
+
+@pytest.mark.asyncio
+async def test_cars_get_car_server_timing(client, get_access_token, mock_car_single):
+    token = await get_access_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = await client.post("/api/v1/cars/", json=mock_car_single, headers=headers)
+    assert response.status_code == 201
+    car_uid = response.json()["result"]["uid"]
+
+    response = await client.get(f"/api/v1/cars/{car_uid}", headers=headers)
+    assert response.status_code == 200
+    metrics = {
+        metric.split(";")[0]: metric
+        for metric in response.headers["Server-Timing"].split(", ")
+    }
+    assert set(metrics) == {
+        "jwt",
+        "user_lookup",
+        "stats",
+        "endpoint",
+        "serialize",
+        "db",
+        "total",
+    }
+    assert metrics["db"].endswith(
+        f'desc="{response.headers["X-DB-Query-Count"]} queries"'
+    )
@@ -1,7 +1,8 @@
-from uuid import uuid4
+from uuid import UUID, uuid4
 
 import pytest
 
+from src.cars.repositories import ExpensesRepository
 from src.users.schemas import UserRole
 from tests.api.cars.cars_helpers import (
     create_mock_car,
@@ -9,6 +10,7 @@ from tests.api.cars.cars_helpers import (
     create_mock_car_w_exp,
 )
 from tests.api.cars.test_cars import mock_car_single
+from tests.conftest import TestSession
 
 
 @pytest.fixture
@@ -468,3 +470,167 @@ async def test_expenses_delete_all_exp_strangers_car(
     override_current_user(user_b)
     response = await client.delete(f"/api/v1/cars/{car_uid}/expenses")
     assert response.status_code == expected_status
+
+
+@pytest.mark.asyncio
+async def test_expenses_get_all_exp_cursor_pagination(
+    client, mock_car_single, mock_user_factory, override_current_user, mock_expenses
+):
+    user_a = mock_user_factory(role=UserRole.USER)
+    override_current_user(user_a)
+    response = await client.post("/api/v1/cars/", json=mock_car_single)
+    assert response.status_code == 201
+    car_uid = response.json()["result"]["uid"]
+    for exp in mock_expenses:
+        response = await client.post(f"/api/v1/cars/{car_uid}", json=exp)
+        assert response.status_code == 201
+
+    response = await client.get(
+        f"/api/v1/cars/{car_uid}/expenses?limit=3&sort_by=exp_summ&order=asc&pagination=cursor"
+    )
+    assert response.status_code == 200
+    first_page = response.json()["result"]
+    assert [exp["exp_summ"] for exp in first_page["content"]] == [1000, 2000, 3000]
+    assert first_page["next_cursor"]
+
+    response = await client.get(
+        f"/api/v1/cars/{car_uid}/expenses?limit=3&sort_by=exp_summ&order=asc"
+        f"&cursor={first_page['next_cursor']}"
+    )
+    assert response.status_code == 200
+    second_page = response.json()["result"]
+    assert [exp["exp_summ"] for exp in second_page["content"]] == [4000, 5000]
+    assert second_page.get("next_cursor") is None
+
+    response = await client.get(
+        f"/api/v1/cars/{car_uid}/expenses?limit=3&sort_by=name&order=asc"
+        f"&cursor={first_page['next_cursor']}"
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_expenses_car_aggregates_maintained(
+    client, get_access_token, mock_car_single
+):
+    token = await get_access_token()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def get_stats():
+        response = await client.get(f"/api/v1/cars/{car_uid}", headers=headers)
+        assert response.status_code == 200
+        return response.json()["result"]["stats"]
+
+    response = await client.post("/api/v1/cars/", json=mock_car_single, headers=headers)
+    assert response.status_code == 201
+    car_uid = response.json()["result"]["uid"]
+
+    response = await client.post(
+        f"/api/v1/cars/{car_uid}",
+        json={"type": "PURCHASE", "name": "Purchase", "exp_summ": 100000},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    response = await client.post(
+        f"/api/v1/cars/{car_uid}",
+        json={"name": "Paint", "exp_summ": 5000},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    paint_uid = response.json()["result"]["uid"]
+    response = await client.patch(
+        f"/api/v1/cars/{car_uid}",
+        json={"price_listed": 250000, "price_sold": 200000},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    stats = await get_stats()
+    assert stats["price_purchased"] == 100000
+    assert stats["total_expenses"] == 5000
+    assert stats["total_cost"] == 105000
+    assert stats["profit"] == 95000
+    assert stats["margin"] == 90.48
+    assert stats["potential_profit"] == 145000
+    assert stats["potential_margin"] == 138.1
+
+    response = await client.patch(
+        f"/api/v1/cars/{car_uid}/expenses/{paint_uid}",
+        json={"name": "Paint", "exp_summ": 15000},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    stats = await get_stats()
+    assert stats["total_expenses"] == 15000
+    assert stats["profit"] == 85000
+
+    response = await client.delete(
+        f"/api/v1/cars/{car_uid}/expenses/{paint_uid}", headers=headers
+    )
+    assert response.status_code == 204
+    stats = await get_stats()
+    assert stats["total_cost"] == 100000
+    assert stats["profit"] == 100000
+    assert stats["margin"] == 100
+
+    response = await client.delete(f"/api/v1/cars/{car_uid}/expenses", headers=headers)
+    assert response.status_code == 204
+    stats = await get_stats()
+    assert stats["total_cost"] == 0
+    assert stats["profit"] == 200000
+    assert stats["margin"] == 0
+
+
+@pytest.mark.asyncio
+async def test_expenses_interleaved_updates_keep_car_totals(
+    client, get_access_token, mock_car_single
+):
+    token = await get_access_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    created = await create_mock_car_w_exp(client, token, mock_car_single)
+    car_uid, exp_uid = UUID(created["car_uid"]), UUID(created["exp_uid"])
+
+    # Two requests have loaded the expense for their access checks
+    async with TestSession() as first, TestSession() as second:
+        first_repo, second_repo = ExpensesRepository(first), ExpensesRepository(second)
+        assert await first_repo.get_single_exp(car_uid, exp_uid)
+        assert await second_repo.get_single_exp(car_uid, exp_uid)
+        await first_repo.update_single_exp(car_uid, exp_uid, {"exp_summ": 7000})
+        await second_repo.update_single_exp(
+            car_uid, exp_uid, {"type": "PURCHASE", "exp_summ": 9000}
+        )
+
+    response = await client.get(f"/api/v1/cars/{car_uid}", headers=headers)
+    assert response.status_code == 200
+    stats = response.json()["result"]["stats"]
+    assert stats["price_purchased"] == 9000
+    assert stats["total_expenses"] == 0
+    assert stats["total_cost"] == 9000
+
+
+@pytest.mark.asyncio
+async def test_expenses_update_after_concurrent_delete(
+    client, get_access_token, mock_car_single
+):
+    token = await get_access_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    created = await create_mock_car_w_exp(client, token, mock_car_single)
+    car_uid, exp_uid = UUID(created["car_uid"]), UUID(created["exp_uid"])
+
+    async with TestSession() as first, TestSession() as second:
+        first_repo, second_repo = ExpensesRepository(first), ExpensesRepository(second)
+        assert await first_repo.get_single_exp(car_uid, exp_uid)
+        assert await second_repo.delete_single_exp(car_uid, exp_uid)
+        assert (
+            await first_repo.update_single_exp(car_uid, exp_uid, {"exp_summ": 7000})
+            is None
+        )
+
+    response = await client.patch(
+        f"/api/v1/cars/{car_uid}/expenses/{exp_uid}",
+        json={"name": "Mock Expense", "exp_summ": 7000},
+        headers=headers,
+    )
+    assert response.status_code == 404
+    response = await client.get(f"/api/v1/cars/{car_uid}", headers=headers)
+    assert response.json()["result"]["stats"]["total_cost"] == 0
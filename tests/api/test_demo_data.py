@@ -0,0 +1,32 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.db.demo_data import run_bounded
+
+
+@pytest.mark.asyncio
+async def test_demo_data_run_bounded_limits_in_flight_jobs():
+    jobs = [(index,) for index in range(20)]
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def job(index: int) -> int:
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return index
+
+    # Пул больше лимита: ограничивает именно run_bounded
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = [result async for result in run_bounded(pool, job, jobs, 3)]
+
+    assert sorted(results) == list(range(20))
+    assert max_in_flight == 3
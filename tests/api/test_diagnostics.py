@@ -0,0 +1,70 @@
+import tracemalloc
+
+import pytest
+
+from src.diagnostics.memory import memory_tracker
+from src.users.schemas import UserRole
+from tests.api.cars.test_cars import mock_car_single
+
+
+@pytest.fixture
+def stop_tracemalloc():
+    """Не оставлять tracemalloc включённым для других тестов"""
+    yield
+    if tracemalloc.is_tracing():
+        memory_tracker.stop()
+
+
+@pytest.mark.asyncio
+async def test_diagnostics_memory_tracing_cycle(
+    client, mock_car_single, mock_user_factory, override_current_user, stop_tracemalloc
+):
+    admin = mock_user_factory(role=UserRole.ADMIN)
+    override_current_user(admin)
+    response = await client.get("/api/v1/diagnostics/memory")
+    assert response.status_code == 200
+    assert response.json()["result"]["tracing"] is False
+
+    response = await client.post("/api/v1/diagnostics/memory/start?frames=5")
+    assert response.status_code == 200
+    assert response.json()["result"]["tracing"] is True
+    assert response.json()["result"]["frames"] == 5
+    response = await client.post("/api/v1/diagnostics/memory/start")
+    assert response.status_code == 409
+
+    response = await client.post("/api/v1/cars/", json=mock_car_single)
+    assert response.status_code == 201
+    response = await client.get("/api/v1/cars/my_cars")
+    assert response.status_code == 200
+    assert int(response.headers["X-Memory-Peak"]) > 0
+
+    response = await client.post(
+        "/api/v1/diagnostics/memory/snapshot",
+        params={"compare_to": "baseline", "group_by": "traceback", "limit": 5},
+    )
+    assert response.status_code == 200
+    result = response.json()["result"]
+    assert result["compared_to"] == "baseline"
+    assert 0 < len(result["top"]) <= 5
+    assert {"traceback", "size", "size_diff", "count", "count_diff"} == set(
+        result["top"][0]
+    )
+
+    response = await client.post("/api/v1/diagnostics/memory/stop")
+    assert response.status_code == 200
+    assert response.json()["result"]["tracing"] is False
+    response = await client.post("/api/v1/diagnostics/memory/stop")
+    assert response.status_code == 409
+    response = await client.get("/api/v1/cars/my_cars")
+    assert "X-Memory-Peak" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_diagnostics_memory_admin_only(
+    client, mock_user_factory, override_current_user
+):
+    user = mock_user_factory(role=UserRole.USER)
+    override_current_user(user)
+    response = await client.post("/api/v1/diagnostics/memory/start")
+    assert response.status_code == 403
+    assert not tracemalloc.is_tracing()
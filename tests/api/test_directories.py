@@ -1,8 +1,13 @@
 import uuid
 import pytest
-from sqlmodel import select
+from sqlmodel import delete, select
+from src.directories.index import MakeModelIndex, directory_index
 from src.directories.models import MakesDirectory, ModelsDirectory
-from tests.conftest import TestSession
+from src.directories.repositories import DirectoryRepository
+from src.directories.utils import load_directory
+from src.users.schemas import UserRole
+from tests.api.cars.test_cars import mock_car_single
+from tests.conftest import DATASET_PATH, TestSession, engine_test
 
 
 @pytest.mark.asyncio
@@ -112,3 +117,285 @@ async def test_get_models_by_make_nonexistent_make_uid(client):
 async def test_get_models_by_make_invalid_make_uid(client):
     response = await client.get(f"/api/v1/directories/makes/123/models")
     assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_search_makes(client):
+    response = await client.get("/api/v1/directories/makes/search?q=to")
+    assert response.status_code == 200
+    makes = [make["make"] for make in response.json()["result"]]
+    assert "Toyota" in makes
+    assert all(make.lower().startswith("to") for make in makes)
+    assert makes == sorted(makes, key=str.casefold)
+
+    response = await client.get("/api/v1/directories/makes/search?q=a&limit=3")
+    assert len(response.json()["result"]) == 3
+    response = await client.get("/api/v1/directories/makes/search?q=zzzz")
+    assert response.json()["result"] == []
+    response = await client.get("/api/v1/directories/makes/search?q=")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_search_models_by_make(client):
+    response = await client.get("/api/v1/directories/makes/search?q=toyota")
+    make_uid = response.json()["result"][0]["uid"]
+
+    response = await client.get(
+        f"/api/v1/directories/makes/{make_uid}/models/search?q=COR"
+    )
+    assert response.status_code == 200
+    models = [model["model"] for model in response.json()["result"]]
+    assert "Corolla" in models
+    assert all(model.lower().startswith("cor") for model in models)
+
+    response = await client.get(
+        f"/api/v1/directories/makes/{uuid.uuid4()}/models/search?q=cor"
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_directory_snapshot_etag(client):
+    response = await client.get("/api/v1/directories/snapshot")
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    etag = response.headers["etag"]
+    makes = {make: models for _, make, models in response.json()["result"]}
+    assert "Corolla" in [model for _, model in makes["Toyota"]]
+
+    response = await client.get(
+        "/api/v1/directories/snapshot", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    response = await client.get(
+        "/api/v1/directories/snapshot",
+        headers={"If-None-Match": '"stale"', "Accept-Encoding": "identity"},
+    )
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    identity_etag = response.headers["etag"]
+    # gzip и identity - разные представления, у каждого свой ETag
+    assert identity_etag != etag
+
+    # ETag другого представления не подходит
+    response = await client.get(
+        "/api/v1/directories/snapshot",
+        headers={"If-None-Match": etag, "Accept-Encoding": "identity"},
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] == identity_etag
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "accept_encoding, gzipped",
+    [
+        ("gzip", True),
+        ("deflate, gzip;q=0.5", True),
+        ("*", True),
+        ("gzip;q=0", False),
+        ("gzip; q=0.0, identity", False),
+        ("*;q=0, identity", False),
+        ("gzip;q=0, *", False),
+        ("x-gzip", True),
+        ("identity", False),
+        ("", False),
+    ],
+)
+async def test_directory_snapshot_accept_encoding(client, accept_encoding, gzipped):
+    response = await client.get(
+        "/api/v1/directories/snapshot", headers={"Accept-Encoding": accept_encoding}
+    )
+    assert response.status_code == 200
+    assert (response.headers.get("content-encoding") == "gzip") is gzipped
+    assert response.headers["etag"].endswith('-gz"') is gzipped
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "Toyota" in [make for _, make, _ in response.json()["result"]]
+
+
+@pytest.mark.asyncio
+async def test_directory_snapshot_if_none_match_list(client):
+    response = await client.get("/api/v1/directories/snapshot")
+    etag = response.headers["etag"]
+
+    for if_none_match in (
+        f'"other", {etag}',
+        f"W/{etag}",
+        "*",
+    ):
+        response = await client.get(
+            "/api/v1/directories/snapshot", headers={"If-None-Match": if_none_match}
+        )
+        assert response.status_code == 304, if_none_match
+        assert response.headers["etag"] == etag
+        assert response.headers["vary"] == "Accept-Encoding"
+
+    # Подстрока ETag - не совпадение
+    for if_none_match in (etag[:-2] + '"', f'"x{etag[1:]}', etag.strip('"')):
+        response = await client.get(
+            "/api/v1/directories/snapshot", headers={"If-None-Match": if_none_match}
+        )
+        assert response.status_code == 200, if_none_match
+
+
+@pytest.mark.asyncio
+async def test_get_all_makes_with_model_count(client):
+    response = await client.get("/api/v1/directories/makes?limit=5")
+    assert all(
+        set(make) == {"uid", "make"} for make in response.json()["result"]["content"]
+    )
+
+    response = await client.get(
+        "/api/v1/directories/makes?limit=5&with_model_count=true"
+    )
+    assert response.status_code == 200
+    makes = response.json()["result"]["content"]
+    assert len(makes) == 5
+    async with TestSession() as session:
+        for make in makes:
+            models = await session.exec(
+                select(ModelsDirectory).where(
+                    ModelsDirectory.make_uid == uuid.UUID(make["uid"])
+                )
+            )
+            assert make["model_count"] == len(models.all())
+
+
+@pytest.mark.asyncio
+async def test_load_directory_idempotent(tmp_path):
+    async def snapshot():
+        async with TestSession() as session:
+            makes = await session.exec(select(MakesDirectory.uid, MakesDirectory.make))
+            models = await session.exec(
+                select(ModelsDirectory.uid, ModelsDirectory.model)
+            )
+            return dict(makes.all()), dict(models.all())
+
+    makes_before, models_before = await snapshot()
+    async with engine_test.begin() as conn:
+        timings = await load_directory(conn)
+    assert timings["rows"] == len(models_before)
+    assert await snapshot() == (makes_before, models_before)
+
+    dataset = tmp_path / "dataset.csv"
+    dataset.write_text(
+        DATASET_PATH.read_text(encoding="utf-8")
+        + "Zaz,Zaporozhets\nToyota,Testmodel\n",
+        encoding="utf-8",
+    )
+    try:
+        async with engine_test.begin() as conn:
+            await load_directory(conn, dataset)
+        makes_after, models_after = await snapshot()
+        assert makes_after.items() >= makes_before.items()
+        assert models_after.items() >= models_before.items()
+        assert set(makes_after.values()) - set(makes_before.values()) == {"Zaz"}
+        assert set(models_after.values()) - set(models_before.values()) == {
+            "Zaporozhets",
+            "Testmodel",
+        }
+    finally:
+        async with engine_test.begin() as conn:
+            await conn.execute(
+                delete(ModelsDirectory).where(
+                    ModelsDirectory.model.in_(["Zaporozhets", "Testmodel"])
+                )
+            )
+            await conn.execute(
+                delete(MakesDirectory).where(MakesDirectory.make == "Zaz")
+            )
+
+
+@pytest.mark.asyncio
+async def test_load_directory_refreshes_index(
+    client, get_access_token, tmp_path, monkeypatch
+):
+    # Без TTL индекс обновляется только через invalidate() из загрузчика
+    monkeypatch.setattr(directory_index, "ttl", 0)
+    async with TestSession() as session:
+        await directory_index.ensure_loaded(session)
+    headers = {"Authorization": f"Bearer {await get_access_token()}"}
+    car = {
+        "make": "Zaz",
+        "model": "Zaporozhets",
+        "year": 1980,
+        "vin": "JZX10012345678901",
+        "pts_num": "55ХВ123123",
+        "sts_num": "9955123123",
+        "date_purchased": "2025-06-18",
+    }
+    response = await client.post("/api/v1/cars/", json=car, headers=headers)
+    assert response.status_code == 404
+
+    dataset = tmp_path / "dataset.csv"
+    dataset.write_text(
+        DATASET_PATH.read_text(encoding="utf-8") + "Zaz,Zaporozhets\n",
+        encoding="utf-8",
+    )
+    try:
+        async with engine_test.begin() as conn:
+            await load_directory(conn, dataset)
+        response = await client.post("/api/v1/cars/", json=car, headers=headers)
+        assert response.status_code == 201
+    finally:
+        async with engine_test.begin() as conn:
+            await conn.execute(
+                delete(ModelsDirectory).where(ModelsDirectory.model == "Zaporozhets")
+            )
+            await conn.execute(
+                delete(MakesDirectory).where(MakesDirectory.make == "Zaz")
+            )
+        directory_index.invalidate()
+
+
+@pytest.mark.asyncio
+async def test_directory_index_invalidate_during_load(monkeypatch):
+    index = MakeModelIndex(ttl=0)
+    get_pairs = DirectoryRepository.get_make_model_pairs
+
+    async def get_pairs_then_invalidate(self):
+        rows = await get_pairs(self)
+        # Справочник изменился, пока загрузка ждала ответа БД
+        index.invalidate()
+        return rows
+
+    monkeypatch.setattr(
+        DirectoryRepository, "get_make_model_pairs", get_pairs_then_invalidate
+    )
+    async with TestSession() as session:
+        await index.load(session)
+    # Старые данные можно читать, но следующий запрос их перезагрузит
+    index.validate("Toyota", "Corolla")
+    assert index.is_stale()
+
+    monkeypatch.setattr(DirectoryRepository, "get_make_model_pairs", get_pairs)
+    async with TestSession() as session:
+        await index.ensure_loaded(session)
+    assert not index.is_stale()
+
+
+@pytest.mark.asyncio
+async def test_directory_index_car_create_skips_directory(
+    client, mock_car_single, mock_user_factory, override_current_user, captured_sql
+):
+    user = mock_user_factory(role=UserRole.USER)
+    override_current_user(user)
+    async with TestSession() as session:
+        await directory_index.ensure_loaded(session)
+    captured_sql.clear()
+
+    response = await client.post("/api/v1/cars/", json=mock_car_single)
+    assert response.status_code == 201
+    response = await client.post(
+        "/api/v1/cars/",
+        json={**mock_car_single, "vin": "JZX10012345678902", "model": "NoSuchModel"},
+    )
+    assert response.status_code == 404
+    assert not [
+        sql for sql, _ in captured_sql if "makesdir" in sql or "modelsdir" in sql
+    ]
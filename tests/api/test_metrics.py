@@ -0,0 +1,42 @@
+import uuid
+
+import pytest
+
+from src.users.schemas import UserRole
+
+
+def sample_value(text: str, prefix: str) -> float:
+    """Значение первой метрики, строка которой начинается с prefix"""
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+@pytest.mark.asyncio
+async def test_metrics_route_latency_and_exceptions(
+    client, mock_user_factory, override_current_user
+):
+    user = mock_user_factory(role=UserRole.USER)
+    override_current_user(user)
+    route_sample = (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/api/v1/cars/{car_uid}",status="404"}'
+    )
+    exception_sample = 'app_exceptions_total{exception="EntityNotFoundException"}'
+    before = (await client.get("/metrics")).text
+
+    for _ in range(2):
+        response = await client.get(f"/api/v1/cars/{uuid.uuid4()}")
+        assert response.status_code == 404
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    after = response.text
+    assert sample_value(after, route_sample) - sample_value(before, route_sample) == 2
+    assert (
+        sample_value(after, exception_sample) - sample_value(before, exception_sample)
+        == 2
+    )
+    assert 'http_requests_in_progress{method="GET"}' in after
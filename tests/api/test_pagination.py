@@ -0,0 +1,92 @@
+import json
+from contextlib import nullcontext
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select as sa_select
+from sqlalchemy.dialects.postgresql.asyncpg import PGDialect_asyncpg
+from sqlmodel import select
+
+from src.cars.models import Cars
+from src.utils.base_service_repo import BaseRepository
+from src.utils.pagination import plan_row_estimate, with_total_count
+
+# Вывод EXPLAIN (FORMAT JSON) из PostgreSQL 16 для фильтра по владельцу
+PG_PLAN = [
+    {
+        "Plan": {
+            "Node Type": "Seq Scan",
+            "Parallel Aware": False,
+            "Async Capable": False,
+            "Relation Name": "cars",
+            "Alias": "cars",
+            "Startup Cost": 0.0,
+            "Total Cost": 1834.0,
+            "Plan Rows": 4210,
+            "Plan Width": 312,
+            "Filter": "(primary_owner_uid = $1)",
+        }
+    }
+]
+
+
+class FakePostgresConnection:
+    """Ровно то, что estimate_records использует от AsyncConnection"""
+
+    dialect = PGDialect_asyncpg()
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.executed = []
+
+    def begin_nested(self):
+        return nullcontext()
+
+    async def exec_driver_sql(self, statement, parameters):
+        self.executed.append((statement, parameters))
+        plan = self.plan
+
+        class Result:
+            def scalar(self):
+                return plan
+
+        return Result()
+
+
+class FakeSession:
+    def __init__(self, connection):
+        self._connection = connection
+
+    async def connection(self):
+        return self._connection
+
+
+@pytest.mark.parametrize("plan", [json.dumps(PG_PLAN), PG_PLAN])
+def test_pagination_plan_row_estimate(plan):
+    assert plan_row_estimate(plan) == 4210
+
+
+@pytest.mark.asyncio
+async def test_pagination_estimate_records_postgres():
+    connection = FakePostgresConnection(json.dumps(PG_PLAN))
+    repository = BaseRepository(FakeSession(connection))
+    owner_uid = uuid4()
+    statement = sa_select(Cars).where(
+        Cars.primary_owner_uid == owner_uid, Cars.year >= 2000
+    )
+
+    assert await repository.estimate_records(statement) == 4210
+    [(sql, params)] = connection.executed
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    # asyncpg: позиционные $n в порядке параметров запроса
+    assert "cars.primary_owner_uid = $1" in sql and "cars.year >= $2" in sql
+    assert params == (owner_uid, 2000)
+
+
+def test_pagination_with_total_count():
+    statement = with_total_count(sa_select(Cars).limit(10))
+    assert list(statement.selected_columns.keys())[-1] == "total_count"
+    assert "count(*) OVER ()" in str(statement)
+
+    with pytest.raises(TypeError):
+        with_total_count(select(Cars))
@@ -0,0 +1,110 @@
+import pstats
+from unittest.mock import patch
+
+import pytest
+from sqlmodel import update
+
+from src.config import Config
+from src.users.models import Users
+from src.users.schemas import UserRole
+from src.utils.profiling import DeterministicProfiler
+from tests.conftest import TestSession
+
+
+async def make_admin(email: str):
+    async with TestSession() as session:
+        await session.exec(
+            update(Users).where(Users.email == email).values(role=UserRole.ADMIN)
+        )
+        await session.commit()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "mode, request_kwargs",
+    [
+        ("sampling", {"params": {"profile": "sampling"}}),
+        ("cprofile", {"headers": {"X-Profile": "cprofile"}}),
+    ],
+)
+async def test_profiling_admin_request_writes_profile(
+    client, get_access_token, tmp_path, mode, request_kwargs
+):
+    email = "admin@example.com"
+    token = await get_access_token(email)
+    await make_admin(email)
+    headers = {"Authorization": f"Bearer {token}", **request_kwargs.pop("headers", {})}
+
+    with patch.object(Config, "PROFILE_DIR", str(tmp_path)):
+        response = await client.get(
+            "/api/v1/cars/my_cars", headers=headers, **request_kwargs
+        )
+    assert response.status_code == 200
+    path = tmp_path / response.headers["X-Profile-File"]
+    assert path.exists()
+    if mode == "cprofile":
+        functions = {func for _, _, func in pstats.Stats(str(path)).stats}
+        assert "get_my_cars" in functions
+    else:
+        for line in path.read_text(encoding="utf-8").splitlines():
+            stack, count = line.rsplit(" ", 1)
+            assert int(count) > 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("token, expected_status", [(True, 200), (False, 401)])
+async def test_profiling_flag_ignored_for_non_admins(
+    client, get_access_token, tmp_path, token, expected_status
+):
+    """Не админ получает обычный ответ маршрута, флаг просто игнорируется"""
+    headers = {}
+    if token:
+        headers["Authorization"] = f"Bearer {await get_access_token()}"
+
+    with patch.object(Config, "PROFILE_DIR", str(tmp_path)):
+        response = await client.get(
+            "/api/v1/cars/my_cars", headers=headers, params={"profile": "bogus"}
+        )
+    assert response.status_code == expected_status
+    assert "X-Profile-File" not in response.headers
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url", ["/metrics", "/api/v1/auth/login"])
+async def test_profiling_not_mounted_outside_business_routes(
+    client, get_access_token, tmp_path, url
+):
+    email = "admin@example.com"
+    token = await get_access_token(email)
+    await make_admin(email)
+
+    with patch.object(Config, "PROFILE_DIR", str(tmp_path)):
+        response = await client.get(
+            url,
+            headers={"Authorization": f"Bearer {token}"},
+            params={"profile": "cprofile"},
+        )
+    assert "X-Profile-File" not in response.headers
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.asyncio
+async def test_profiling_concurrent_cprofile_conflict(
+    client, get_access_token, tmp_path
+):
+    email = "admin@example.com"
+    token = await get_access_token(email)
+    await make_admin(email)
+    headers = {"Authorization": f"Bearer {token}", "X-Profile": "cprofile"}
+
+    # Пока идёт другой прогон cProfile, второй получает 409, а не 500
+    with patch.object(Config, "PROFILE_DIR", str(tmp_path)):
+        with DeterministicProfiler._lock:
+            response = await client.get("/api/v1/cars/my_cars", headers=headers)
+        assert response.status_code == 409
+        assert "X-Profile-File" not in response.headers
+
+        response = await client.get("/api/v1/cars/my_cars", headers=headers)
+    assert response.status_code == 200
+    assert (tmp_path / response.headers["X-Profile-File"]).exists()
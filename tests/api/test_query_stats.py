@@ -0,0 +1,36 @@
+import pytest
+
+from src.users.schemas import UserRole
+from tests.api.cars.test_cars import mock_car_single
+
+
+@pytest.mark.asyncio
+async def test_query_stats_endpoints_within_query_budget(
+    client, mock_car_single, mock_user_factory, override_current_user, query_budget
+):
+    user = mock_user_factory(role=UserRole.USER)
+    override_current_user(user)
+    response = await client.post("/api/v1/cars/", json=mock_car_single)
+    assert response.status_code == 201
+    car_uid = response.json()["result"]["uid"]
+    for exp_summ in (1000, 2000, 3000):
+        response = await client.post(
+            f"/api/v1/cars/{car_uid}",
+            json={"type": "PARTS", "name": "Запчасти", "exp_summ": exp_summ},
+        )
+        assert response.status_code == 201
+    exp_uid = response.json()["result"]["uid"]
+
+    # Budgets don't grow with the number of expenses or owners
+    budgets = {
+        f"/api/v1/cars/{car_uid}": 4,
+        "/api/v1/cars/my_cars": 2,
+        f"/api/v1/cars/{car_uid}/expenses": 3,
+        f"/api/v1/cars/{car_uid}/expenses/{exp_uid}": 3,
+    }
+    for url, budget in budgets.items():
+        with query_budget(budget) as stats:
+            response = await client.get(url)
+        assert response.status_code == 200
+        assert int(response.headers["X-DB-Query-Count"]) <= stats.count
+        assert float(response.headers["X-DB-Query-Time"]) >= 0
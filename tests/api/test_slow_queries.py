@@ -0,0 +1,36 @@
+from unittest.mock import patch
+
+import pytest
+
+from src.config import Config
+from src.users.schemas import UserRole
+from tests.api.cars.test_cars import mock_car_single
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_logged_with_plan(
+    client, mock_car_single, mock_user_factory, override_current_user, tmp_path
+):
+    user = mock_user_factory(role=UserRole.USER)
+    override_current_user(user)
+    response = await client.post("/api/v1/cars/", json=mock_car_single)
+    assert response.status_code == 201
+
+    log_file = tmp_path / "slow.log"
+    with patch.multiple(
+        Config, SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_LOG_FILE=str(log_file)
+    ):
+        response = await client.get("/api/v1/cars/my_cars?sort_by=year")
+    assert response.status_code == 200
+
+    log = log_file.read_text(encoding="utf-8")
+    entry = next(
+        entry
+        for entry in log.split("slow query ")
+        if "ORDER BY cars.year" in entry and "LIMIT" in entry
+    )
+    assert "CarsRepository.get_my_cars" in entry
+    assert "plan:" in entry and "cars" in entry.split("plan:")[1]
+    # Только типы параметров, без значений
+    assert "parameters: [" in entry
+    assert str(user.uid) not in log and user.uid.hex not in log
@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from src.utils.middleware import ServerTimingMiddleware
+from src.utils.timing import TimedRoute
+
+
+@pytest.mark.asyncio
+async def test_timing_sync_and_async_endpoints():
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/sync")
+    def sync_endpoint():
+        return {"thread": threading.get_ident()}
+
+    @router.get("/async")
+    async def async_endpoint():
+        return {"thread": threading.get_ident()}
+
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+    app.include_router(router)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        for url, in_loop_thread in (("/sync", False), ("/async", True)):
+            response = await client.get(url)
+            assert response.status_code == 200
+            # def-эндпоинт выполняется в threadpool, а не в event loop
+            assert (response.json()["thread"] == threading.get_ident()) is (
+                in_loop_thread
+            )
+            metrics = [
+                metric.split(";")[0]
+                for metric in response.headers["Server-Timing"].split(", ")
+            ]
+            assert "endpoint" in metrics and "serialize" in metrics
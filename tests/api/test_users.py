@@ -1,6 +1,12 @@
 import uuid
 import pytest
+from sqlmodel import select
+
+from src.cars.models import Cars, Expenses
+from src.cars.schemas import ExpenseType
+from src.shared.car_user_link import CarUserLink
 from src.users.schemas import UserRole
+from tests.conftest import TestSession
 
 
 # Общие данные для создания пользователя
@@ -144,10 +150,8 @@ async def test_get_all_users_role(
 async def test_get_all_users_pagination_sorted_by_username(
     client, mock_user_factory, override_current_user
 ):
-    admin_user = mock_user_factory(UserRole.ADMIN)
-    override_current_user(admin_user)
-
     usernames = ["tony", "chris", "paulie", "carmella", "corrado", "meadow", "silvio"]
+    uids = []
     for name in usernames:
         response = await client.post(
             "/api/v1/users/signup",
@@ -160,6 +164,11 @@ async def test_get_all_users_pagination_sorted_by_username(
             },
         )
         assert response.status_code == 201
+        uids.append(response.json()["result"]["uid"])
+
+    # Админ - один из этих пользователей, лишней строки в users не появляется
+    admin_user = mock_user_factory(UserRole.ADMIN, uid=uids[0])
+    override_current_user(admin_user)
 
     expected_sorted = sorted(usernames)
 
@@ -361,6 +370,85 @@ async def test_delete_user_by_uid_role_and_ownership(
         assert response.status_code == 404
 
 
+@pytest.mark.asyncio
+async def test_delete_user_by_uid_cascades(
+    client, get_access_token, create_user, mock_user_factory, override_current_user
+):
+    car_data = {
+        "make": "Toyota",
+        "model": "Corolla",
+        "year": 2005,
+        "pts_num": "55ХВ123123",
+        "sts_num": "9955123123",
+        "date_purchased": "2025-06-18",
+        "status": "FRESH",
+    }
+    token_a = await get_access_token("owner_a@cars.com")
+    headers_a = {"Authorization": f"Bearer {token_a}"}
+    user_b_uid = (await create_user("owner_b", "owner_b@cars.com"))["uid"]
+    response = await client.post(
+        "/api/v1/auth/login",
+        data={"username": "owner_b@cars.com", "password": "securepassword"},
+    )
+    headers_b = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    # Машина A с совладельцем B и расходами обоих, и своя машина B
+    response = await client.post(
+        "/api/v1/cars/",
+        json={**car_data, "vin": "JZX10012345678901"},
+        headers=headers_a,
+    )
+    shared_car_uid = response.json()["result"]["uid"]
+    response = await client.post(
+        f"/api/v1/cars/{shared_car_uid}/owners",
+        params={"new_owner_uid": user_b_uid},
+        headers=headers_a,
+    )
+    assert response.status_code == 200
+    for headers in (headers_a, headers_b):
+        response = await client.post(
+            f"/api/v1/cars/{shared_car_uid}",
+            json={"name": "Paint", "exp_summ": 5000},
+            headers=headers,
+        )
+        assert response.status_code == 201
+    response = await client.post(
+        "/api/v1/cars/",
+        json={**car_data, "vin": "JZX10012345678902"},
+        headers=headers_b,
+    )
+    assert response.status_code == 201
+
+    override_current_user(mock_user_factory(UserRole.ADMIN))
+    response = await client.delete(f"/api/v1/users/{user_b_uid}")
+    assert response.status_code == 204
+
+    # Машина B, его расходы и связи совладения удалены каскадом
+    async with TestSession() as session:
+        cars = (await session.exec(select(Cars.uid))).all()
+        expenses = (await session.exec(select(Expenses.user_uid))).all()
+        links = (await session.exec(select(CarUserLink))).all()
+    assert [str(uid) for uid in cars] == [shared_car_uid]
+    assert len(expenses) == 1 and str(expenses[0]) != user_b_uid
+    assert links == []
+
+    # Итоги общей машины без расходов B
+    response = await client.get(f"/api/v1/cars/{shared_car_uid}", headers=headers_a)
+    assert response.status_code == 200
+    stats = response.json()["result"]["stats"]
+    assert stats["total_expenses"] == 5000
+    assert stats["total_cost"] == stats["price_purchased"] + 5000
+
+    # Хранимые агрегаты совпадают с оставшимися после каскада расходами
+    async with TestSession() as session:
+        car = (await session.exec(select(Cars))).one()
+        remaining = (await session.exec(select(Expenses))).all()
+    assert car.expenses_total == sum(
+        exp.exp_summ for exp in remaining if exp.type != ExpenseType.PURCHASE
+    )
+    assert car.total_cost == sum(exp.exp_summ for exp in remaining)
+
+
 @pytest.mark.asyncio
 async def test_delete_user_by_uid_nonexistent_uid(
     client, mock_user_factory, override_current_user
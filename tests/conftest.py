@@ -1,17 +1,20 @@
 import os
 import uuid
+from contextlib import contextmanager
 from pathlib import Path
 
 import pytest
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 from httpx import AsyncClient, ASGITransport
 import pandas as pd
 from src.directories.models import MakesDirectory, ModelsDirectory
 from src.main import app
-from src.db.core import get_session
+from src.db.core import get_session, instrument_engine, track_queries
+from src.users.models import Users
 from src.users.schemas import UserSchema, UserRole
 from src.auth.dependencies import get_current_user
 
@@ -19,7 +22,17 @@ PROJECT_ROOT = Path(__file__).parent.parent
 DATASET_PATH = PROJECT_ROOT / "src" / "directories" / "make_model_dataset.csv"
 
 DATABASE_URL = "sqlite+aiosqlite:///:memory:"
-engine_test = create_async_engine(DATABASE_URL, echo=False)
+engine_test = instrument_engine(create_async_engine(DATABASE_URL, echo=False))
+
+
+@event.listens_for(engine_test.sync_engine, "connect")
+def enable_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores FOREIGN KEY ... ON DELETE CASCADE unless asked to enforce it
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
 TestSession = sessionmaker(engine_test, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -105,17 +118,49 @@ def get_access_token(client, create_user):
     return _get
 
 
+@pytest.fixture
+def query_budget():
+    """Упасть, если в блоке выполнено больше SQL-запросов, чем объявлено"""
+
+    @contextmanager
+    def _budget(max_queries: int):
+        with track_queries(record=True) as stats:
+            yield stats
+        assert (
+            stats.count <= max_queries
+        ), f"{stats.count} queries over a budget of {max_queries}:\n" + "\n".join(
+            stats.statements
+        )
+
+    return _budget
+
+
+@pytest.fixture
+def captured_sql():
+    """Собрать SQL-запросы, выполненные приложением"""
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine_test.sync_engine, "before_cursor_execute", _capture)
+    yield statements
+    event.remove(engine_test.sync_engine, "before_cursor_execute", _capture)
+
+
 # user-router
 @pytest.fixture
 def mock_user_factory():
     """Фабрика мок-пользователей"""
 
     def _create(role: UserRole, uid: uuid.UUID = None) -> UserSchema:
+        uid = uuid.UUID(str(uid)) if uid else uuid.uuid4()
         return UserSchema(
-            uid=uid or uuid.uuid4(),
+            uid=uid,
             role=role,
-            username=f"{role}_mock",
-            email=f"{role}_mock@example.com",
+            username=f"{role}_mock_{uid.hex[:8]}",
+            email=f"{role}_mock_{uid.hex[:8]}@example.com",
             first_name="Mock",
             last_name="User",
             is_verified=True,
@@ -130,7 +175,22 @@ def override_current_user():
     """Переопределить текущего пользователя (получить его токен)"""
 
     def _override(user: UserSchema):
-        app.dependency_overrides[get_current_user] = lambda: user
+        saved = False
+
+        async def _current_user():
+            # Внешние ключи на users проверяются: мок-пользователь должен быть в БД
+            nonlocal saved
+            if not saved:
+                async with TestSession() as session:
+                    if await session.get(Users, user.uid) is None:
+                        session.add(
+                            Users(**user.model_dump(), password_hash=user.password_hash)
+                        )
+                        await session.commit()
+                saved = True
+            return user
+
+        app.dependency_overrides[get_current_user] = _current_user
 
     yield _override
     app.dependency_overrides.pop(get_current_user, None)